@@ -0,0 +1,71 @@
+###############################################################################
+# Description
+###############################################################################
+
+# Tests for the sanitizer. Run with: python -m unittest discover tests
+
+###############################################################################
+# Imports
+###############################################################################
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from unit_trace import sanitizer
+
+###############################################################################
+# Tests
+###############################################################################
+
+class Record(object):
+    def __init__(self, type_name, pid, job):
+        self.record_type = 'event'
+        self.type_name = type_name
+        self.pid = pid
+        self.job = job
+
+def sanitize(records):
+    return [(record.type_name, record.pid, record.job) for record in
+        sanitizer.sanitizer([Record(*record) for record in records])]
+
+class SanitizerTest(unittest.TestCase):
+
+    # The switch_away after a completion is recorded for the next job, which
+    # has not been switched to yet
+    def test_switch_away_after_completion(self):
+        self.assertEqual(sanitize([
+            ('release', 1, 3), ('switch_to', 1, 3), ('completion', 1, 3),
+            ('switch_away', 1, 4)]), [
+            ('release', 1, 3), ('switch_to', 1, 3), ('completion', 1, 3),
+            ('switch_away', 1, 3)])
+
+    # Jobs of a task that complete out of order keep their own switch_away
+    def test_out_of_order_completions(self):
+        records = [
+            ('release', 1, 37), ('switch_to', 1, 37),
+            ('release', 1, 38), ('switch_to', 1, 38),
+            ('release', 1, 39), ('switch_to', 1, 39),
+            ('release', 1, 40), ('switch_to', 1, 40),
+            ('completion', 1, 40), ('switch_away', 1, 41),
+            ('completion', 1, 37), ('switch_away', 1, 37),
+            ('switch_away', 1, 38), ('switch_to', 1, 38),
+            ('completion', 1, 39), ('switch_away', 1, 40),
+            ('completion', 1, 38), ('switch_away', 1, 39)]
+        expected = records[:]
+        expected[9] = ('switch_away', 1, 40)
+        self.assertEqual(sanitize(records), expected)
+
+    # A job that was never switched to stays unknown after later jobs ran
+    def test_gap_in_jobs(self):
+        self.assertEqual(sanitize([
+            ('switch_to', 1, 3), ('switch_to', 1, 5), ('switch_to', 1, 6),
+            ('switch_away', 1, 4), ('switch_away', 1, 5),
+            ('switch_to', 1, 4), ('switch_away', 1, 4)])[3:], [
+            ('switch_away', 1, 3), ('switch_away', 1, 5),
+            ('switch_to', 1, 4), ('switch_away', 1, 4)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+###############################################################################
+# Description
+###############################################################################
+
+# Feed a stream to several output submodules in one pass.
+#
+# Each output submodule provides a sink: an object with a process(record)
+# method, called for every record as it comes out of the stream, and a
+# finish() method, called once the stream is exhausted. Sinks that do not
+# need to see the whole stream at once therefore use constant memory,
+# instead of having the records buffered for them (as with itertools.tee)
+# while the other outputs run.
+
+###############################################################################
+# Public functions
+###############################################################################
+
+# Feed every record of the stream to each sink, in the order given, and then
+# finish the sinks in the same order
+def dispatcher(stream, sinks):
+    for record in stream:
+        for sink in sinks:
+            sink.process(record)
+    for sink in sinks:
+        sink.finish()
@@ -0,0 +1,240 @@
+###############################################################################
+# Description
+###############################################################################
+
+# Write event records and G-EDF / P-EDF error records to a file in a
+# machine-readable format: NDJSON, CSV or a compact binary columnar format.
+# Other records (e.g. meta records) are not written.
+#
+# All formats share the columns in COLUMNS. Each record gets:
+#   - 'record_type': 'event' or 'error'
+#   - 'type_name': e.g. 'release' or 'inversion_end'
+#   - 'id': the event ID, or the error ID (error IDs are counted separately)
+#   - 'cpu', 'pid', 'job', 'when' and 'deadline' of an event, or of the job an
+#       error is about ('cpu' is the partition of the job in P-EDF, 'when' is
+#       the time the error was found at)
+#   - the 'triggering_event_id', 'inversion_start_id',
+#       'inversion_start_triggering_event_id', 'inversion_start',
+#       'inversion_end', 'late_completion' and 'partition' of an error, as
+#       printed by the stdout_printer ('partition' is also set for params
+#       events)
+# Columns that do not apply to a record are left out (NDJSON), left empty
+# (CSV), or set to NULL_VALUE (binary). NDJSON also includes the other fields
+# of event records (e.g. 'period' or 'exec_time'), and the jobs in the queues
+# of errors, as [pid, job] pairs in 'off_cpu' and 'on_cpu'.
+#
+# The binary format starts with the magic string BINARY_MAGIC, followed by a
+# little-endian uint32 length and that many bytes of JSON, describing the
+# columns ('columns', a list of [name, struct format character] pairs), the
+# types the 'type' column is an index into ('types', a list of
+# [record_type, type_name] pairs), and 'null' (NULL_VALUE). Then come blocks of
+# up to BINARY_BLOCK_SIZE rows: a uint32 number of rows, followed by the values
+# of each column in turn, little-endian. read_binary(file) reads it back.
+#
+# The exporters keep at most one block of rows in memory, and write through a
+# buffer of EXPORT_BUFFER_SIZE bytes. If unit-trace stops early (e.g. when a
+# test module finds the trace inconsistent), the records up to that point are
+# still written out.
+
+###############################################################################
+# Imports
+###############################################################################
+
+import atexit
+import csv
+import json
+import struct
+
+from unit_trace import trace_reader
+
+###############################################################################
+# Public functions
+###############################################################################
+
+COLUMNS = ['record_type', 'type_name', 'id', 'cpu', 'pid', 'job', 'when',
+    'deadline', 'triggering_event_id', 'inversion_start_id',
+    'inversion_start_triggering_event_id', 'inversion_start', 'inversion_end',
+    'late_completion', 'partition']
+
+EXPORT_BUFFER_SIZE = 1 << 20
+BINARY_MAGIC = 'UTEXPORT'
+BINARY_BLOCK_SIZE = 65536
+NULL_VALUE = -1
+
+# Write the records of a stream to a file, in the given format ('ndjson',
+# 'csv' or 'binary')
+def exporter(stream, file, format):
+    sink = get_exporter(file, format)
+    for record in stream:
+        sink.process(record)
+    sink.finish()
+
+# Return a sink for the dispatcher (see dispatcher.py), writing records to a
+# file in the given format ('ndjson', 'csv' or 'binary')
+def get_exporter(file, format):
+    if format == 'csv':
+        return CsvExporter(file)
+    elif format == 'binary':
+        return BinaryExporter(file)
+    else:
+        return NdjsonExporter(file)
+
+# Writes one JSON object per line
+class NdjsonExporter(object):
+
+    def __init__(self, file):
+        self.f = open(file, 'w', EXPORT_BUFFER_SIZE)
+        self.encoder = json.JSONEncoder(separators=(',', ':'))
+        atexit.register(self.finish)
+
+    def process(self, record):
+        row = get_row(record)
+        if row is None:
+            return
+        data = {}
+        for key, value in zip(COLUMNS, row):
+            if value is not None:
+                data[key] = value
+        if record.record_type == 'event':
+            for key, value in trace_reader.get_fields(record):
+                if key not in data:
+                    data[key] = _get_json_value(value)
+        else:
+            data['off_cpu'] = [[job.pid, job.job] for job in record.off_cpu]
+            data['on_cpu'] = [[job.pid, job.job] for job in record.on_cpu]
+        self.f.write(self.encoder.encode(data))
+        self.f.write('\n')
+
+    def finish(self):
+        if not self.f.closed:
+            self.f.close()
+
+# Writes a header line with the names of the columns, and then one line per
+# record
+class CsvExporter(object):
+
+    def __init__(self, file):
+        self.f = open(file, 'wb', EXPORT_BUFFER_SIZE)
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(COLUMNS)
+        atexit.register(self.finish)
+
+    def process(self, record):
+        row = get_row(record)
+        if row is not None:
+            self.writer.writerow(row)
+
+    def finish(self):
+        if not self.f.closed:
+            self.f.close()
+
+# Writes blocks of columns (see the description above)
+class BinaryExporter(object):
+
+    def __init__(self, file):
+        self.f = open(file, 'wb', EXPORT_BUFFER_SIZE)
+        types = _get_all_types()
+        self.type_codes = dict(zip(types, range(len(types))))
+        self.rows = []
+        header = json.dumps({'columns': _BINARY_COLUMNS,
+            'types': [list(type) for type in types], 'null': NULL_VALUE})
+        self.f.write(BINARY_MAGIC + struct.pack('<I', len(header)) + header)
+        atexit.register(self.finish)
+
+    def process(self, record):
+        row = get_row(record)
+        if row is None:
+            return
+        values = [self.type_codes[row[0], row[1]]]
+        for value in row[2:]:
+            if value is None:
+                value = NULL_VALUE
+            values.append(value)
+        self.rows.append(values)
+        if len(self.rows) == BINARY_BLOCK_SIZE:
+            self._write_block()
+
+    def finish(self):
+        if self.f.closed:
+            return
+        if len(self.rows) > 0:
+            self._write_block()
+        self.f.close()
+
+    def _write_block(self):
+        self.f.write(struct.pack('<I', len(self.rows)))
+        for column, (name, code) in enumerate(_BINARY_COLUMNS):
+            values = [row[column] for row in self.rows]
+            self.f.write(struct.pack('<%d%s' % (len(values), code), *values))
+        self.rows = []
+
+# Return the values of the columns for a record, or None if it is not written
+def get_row(record):
+    if record.record_type == 'event':
+        return ['event', record.type_name, record.id, record.cpu, record.pid,
+            record.job, record.when, getattr(record, 'deadline', None), None,
+            None, None, None, None, None, getattr(record, 'partition', None)]
+    elif record.record_type == 'error':
+        job = record.job
+        when = job.inversion_end
+        if record.type_name == 'inversion_start':
+            when = job.inversion_start
+        elif record.type_name == 'miss_deadline':
+            when = record.late_completion
+        elif record.type_name == 'wrong_partition':
+            when = record.when
+        return ['error', record.type_name, record.id,
+            getattr(job, 'partition', None), job.pid, job.job, when,
+            job.deadline, record.triggering_event_id,
+            getattr(record, 'inversion_start_id', None),
+            getattr(record, 'inversion_start_triggering_event_id', None),
+            job.inversion_start, job.inversion_end, record.late_completion,
+            getattr(record, 'partition', None)]
+    return None
+
+# Read a file written by BinaryExporter. Returns an iterator over its blocks,
+# each a dict mapping column names to tuples of values. The 'type' column is
+# replaced by 'record_type' and 'type_name' columns.
+def read_binary(file):
+    f = open(file, 'rb')
+    if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("%s is not a unit-trace export file" % (file))
+    size = struct.unpack('<I', f.read(4))[0]
+    header = json.loads(f.read(size))
+    while True:
+        data = f.read(4)
+        if len(data) < 4:
+            break
+        num_rows = struct.unpack('<I', data)[0]
+        block = {}
+        for name, code in header['columns']:
+            format = '<%d%s' % (num_rows, code)
+            block[name] = struct.unpack(format,
+                f.read(struct.calcsize(format)))
+        types = [header['types'][code] for code in block.pop('type')]
+        block['record_type'] = tuple([str(type[0]) for type in types])
+        block['type_name'] = tuple([str(type[1]) for type in types])
+        yield block
+    f.close()
+
+###############################################################################
+# Private functions
+###############################################################################
+
+# Columns of the binary format, and their struct format characters
+_BINARY_COLUMNS = [['type', 'B']] + [[name, 'q'] for name in COLUMNS[2:]]
+
+# Return a field of an event record as a JSON value. Character fields become
+# their numeric value, and strings lose their NUL padding.
+def _get_json_value(value):
+    if isinstance(value, str):
+        if len(value) == 1:
+            return ord(value)
+        return value.rstrip('\0').decode('utf-8', 'replace')
+    return value
+
+# Return every (record_type, type_name) pair that can be written
+def _get_all_types():
+    return ([('event', name) for name in trace_reader.get_type_names()] +
+        [('error', name) for name in ['inversion_start', 'inversion_end',
+        'miss_deadline', 'wrong_partition']])
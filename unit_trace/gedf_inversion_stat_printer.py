@@ -3,80 +3,162 @@
 ###############################################################################
 # Compute and print G-EDF inversion statistics
 
+###############################################################################
+# Imports
+###############################################################################
+
+import heapq
+import json
+
+from unit_trace.histogram import LogLinearHistogram
 
 ###############################################################################
 # Public Functions
 ###############################################################################
 
-def gedf_inversion_stat_printer(stream,num):
+def gedf_inversion_stat_printer(stream,num,show_histogram=False,
+        merge_files=None,export_file=None):
+    printer = GedfInversionStatPrinter(num,show_histogram,merge_files,
+        export_file)
+    for record in stream:
+        printer.process(record)
+    printer.finish()
 
-    # State
-    min_inversion = -1
-    max_inversion = -1
-    sum_inversions = 0
-    num_inversions = 0
-    longest_inversions = []
+# Sink for the dispatcher (see dispatcher.py), printing the statistics once
+# all records have been seen.
+#
+# Inversion lengths are kept in log-linear histograms (see histogram.py), one
+# for the whole system and one per task, from which the statistics and
+# quantiles are printed. If show_histogram is set, the system histogram and
+# the quantiles of each task are printed too. The histograms of earlier runs
+# (saved with export_file) can be added in from the files in merge_files.
+class GedfInversionStatPrinter(object):
 
-    # Iterate over records, updating state
-    for record in stream:
+    def __init__(self,num,show_histogram=False,merge_files=None,
+            export_file=None):
+
+        # State
+        self.num = num
+        self.show_histogram = show_histogram
+        self.merge_files = merge_files or []
+        self.export_file = export_file
+        self.num_inversions = 0
+        self.histogram = LogLinearHistogram()
+        self.task_histograms = {}
+
+        # Min-heap of the num longest inversions so far, as (length, seq,
+        # info) tuples. seq counts the inversions, so that of two inversions
+        # of the same length, the earlier one is dropped first. info is a
+        # tuple of what gets printed about the inversion (see _get_info).
+        self.longest_inversions = []
+
+    # Update state with a record
+    def process(self,record):
+        num = self.num
         if record.type_name == 'inversion_end':
             length = record.job.inversion_end - record.job.inversion_start
             if length > 0:
-                num_inversions += 1
-                if length > max_inversion:
-                    max_inversion = length
-                if length < min_inversion or min_inversion == -1:
-                    min_inversion = length
-                sum_inversions += length
-                if len(longest_inversions) == num:
+                self.num_inversions += 1
+                self.histogram.add(length)
+                if record.job.pid not in self.task_histograms:
+                    self.task_histograms[record.job.pid] = LogLinearHistogram()
+                self.task_histograms[record.job.pid].add(length)
+                if len(self.longest_inversions) == num:
                     if num==0:
-                        continue
-                    si = longest_inversions[0]
-                    if length > (si.job.inversion_end -
-                        si.job.inversion_start):
-                        longest_inversions.append(record)
-                        longest_inversions = _sort_longest_inversions(
-                            longest_inversions)
-                        del longest_inversions[0]
+                        return
+                    if length > self.longest_inversions[0][0]:
+                        heapq.heapreplace(self.longest_inversions,
+                            (length, self.num_inversions, _get_info(record)))
                 else:
-                    longest_inversions.append(record)
-                    longest_inversions = _sort_longest_inversions(
-                        longest_inversions)
-
-    # We've seen all records.
-    # Further update state
-    if num_inversions > 0:
-        avg_inversion = int(sum_inversions / num_inversions)
-    else:
+                    heapq.heappush(self.longest_inversions,
+                        (length, self.num_inversions, _get_info(record)))
+
+    def finish(self):
+
+        # We've seen all records.
+        # Further update state
+        for file in self.merge_files:
+            _merge_histograms(file, self.histogram, self.task_histograms)
+        if self.export_file is not None:
+            _export_histograms(self.export_file, self.histogram,
+                self.task_histograms)
+        histogram = self.histogram
+        min_inversion = -1
+        max_inversion = -1
         avg_inversion = 0
+        if histogram.count > 0:
+            min_inversion = histogram.min
+            max_inversion = histogram.max
+            avg_inversion = int(histogram.total / histogram.count)
 
-    # Print out our information
-    # NOTE: Here, we assume nanoseconds as the time unit.
-    # May have to be changed in the future.
-    print "Num inversions: %d" % (num_inversions)
-    print "Min inversion: %f ms" % (float(min_inversion) / 1000000)
-    print "Max inversion: %f ms" % (float(max_inversion) / 1000000)
-    print "Avg inversion: %f ms" % (float(avg_inversion) / 1000000)
-    for inv in longest_inversions:
-        print ""
-        print "Inversion record IDs: (%d, %d)" % (inv.inversion_start_id,
-            inv.id)
-        print("Triggering Event IDs: (%d, %d)" %
-            (inv.inversion_start_triggering_event_id,
-            inv.triggering_event_id))
-        print "Time: %d" % (inv.job.inversion_end)
+        # Print out our information
         # NOTE: Here, we assume nanoseconds as the time unit.
         # May have to be changed in the future.
-        print "Duration: %f ms" % (
-            float(inv.job.inversion_end - inv.job.inversion_start) / 1000000)
-        print "Job: %d.%d" % (inv.job.pid,inv.job.job)
-        print "Deadline: %d" % (inv.job.deadline)
-        print ""
-
-
-def _sort_longest_inversions(longest_inversions):
-    """ Sort longest inversions"""
-    def sortkey(x):
-        return x.job.inversion_end - x.job.inversion_start
-    longest_inversions.sort(key=sortkey)
-    return longest_inversions
+        print "Num inversions: %d" % (histogram.count)
+        print "Min inversion: %f ms" % (float(min_inversion) / 1000000)
+        print "Max inversion: %f ms" % (float(max_inversion) / 1000000)
+        print "Avg inversion: %f ms" % (float(avg_inversion) / 1000000)
+        for q, name in QUANTILES:
+            print "%s inversion: %f ms" % (name,
+                float(histogram.quantile(q)) / 1000000)
+        if self.show_histogram:
+            print ""
+            print "Inversion histogram:"
+            for low, high, count in histogram.log_buckets():
+                print "[%f, %f) ms: %d" % (float(low) / 1000000,
+                    float(high) / 1000000, count)
+            for pid in sorted(self.task_histograms):
+                task_histogram = self.task_histograms[pid]
+                print ""
+                print "Task %d inversions: %d" % (pid, task_histogram.count)
+                for q, name in QUANTILES:
+                    print "%s inversion: %f ms" % (name,
+                        float(task_histogram.quantile(q)) / 1000000)
+        for length, seq, inv in sorted(self.longest_inversions):
+            (start_id, end_id, start_event_id, end_event_id, time, pid, job,
+                deadline) = inv
+            print ""
+            print "Inversion record IDs: (%d, %d)" % (start_id, end_id)
+            print("Triggering Event IDs: (%d, %d)" %
+                (start_event_id, end_event_id))
+            print "Time: %d" % (time)
+            # NOTE: Here, we assume nanoseconds as the time unit.
+            # May have to be changed in the future.
+            print "Duration: %f ms" % (float(length) / 1000000)
+            print "Job: %d.%d" % (pid,job)
+            print "Deadline: %d" % (deadline)
+            print ""
+
+
+# Quantiles of inversion length to print, and their names
+QUANTILES = [(0.5, 'P50'), (0.9, 'P90'), (0.99, 'P99'), (0.999, 'P99.9')]
+
+# Add the histograms saved in a file by _export_histograms to the system
+# histogram and the task histograms
+def _merge_histograms(file, histogram, task_histograms):
+    f = open(file, 'r')
+    data = json.load(f)
+    f.close()
+    histogram.merge(LogLinearHistogram.from_dict(data['system']))
+    for pid, task_data in data['tasks'].iteritems():
+        pid = int(pid)
+        if pid not in task_histograms:
+            task_histograms[pid] = LogLinearHistogram()
+        task_histograms[pid].merge(LogLinearHistogram.from_dict(task_data))
+
+# Save the system histogram and the task histograms to a file, as JSON
+def _export_histograms(file, histogram, task_histograms):
+    data = {'system': histogram.to_dict(), 'tasks': {}}
+    for pid, task_histogram in task_histograms.iteritems():
+        data['tasks'][str(pid)] = task_histogram.to_dict()
+    f = open(file, 'w')
+    json.dump(data, f)
+    f.close()
+
+# Return what gets printed about an inversion, from its inversion_end record,
+# without keeping the record (and the queues it refers to)
+def _get_info(record):
+    return (record.inversion_start_id, record.id,
+        record.inversion_start_triggering_event_id, record.triggering_event_id,
+        record.job.inversion_end, record.job.pid, record.job.job,
+        record.job.deadline)
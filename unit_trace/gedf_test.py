@@ -8,6 +8,7 @@
 # Imports
 ###############################################################################
 
+import bisect
 import copy
 import sys
 
@@ -18,9 +19,11 @@ import sys
 
 def gedf_test(stream):
 
-    # System model
-    on_cpu = []     # Tasks on a CPU
-    off_cpu = []    # Tasks not on a CPU
+    # System model. Jobs are keyed by (pid, job). The order they were added
+    # to their queue in is kept by eligible (see EligibleJobs).
+    on_cpu = {}                 # Tasks on a CPU
+    off_cpu = {}                # Tasks not on a CPU
+    eligible = EligibleJobs()   # Jobs contending for a CPU, by priority
     m = None        # CPUs
     timer_resolution = 1000000	    # Resolution of gaps between jobs
 
@@ -50,7 +53,7 @@ def gedf_test(stream):
         # so we only check when the time has moved forward)
         # Also, need to update the first_event_this_timestamp variable
         if last_time is not None and (last_time // timer_resolution) != (record.when // timer_resolution):
-            errors = _gedf_check(off_cpu,on_cpu,last_time,m,
+            errors = _gedf_check(off_cpu,on_cpu,eligible,last_time,m,
                 record.id - 1)
             first_event_this_timestamp = record.id
             for error in errors:
@@ -58,70 +61,67 @@ def gedf_test(stream):
 
         # Add a newly-released Job to the off_cpu queue
         if record.type_name == 'release':
-            off_cpu.append(Job(record))
+            job = Job(record)
+            off_cpu[job.pid, job.job] = job
+            eligible.enqueue(job, True)
 
         # Move a Job from the off_cpu queue to on_cpu
         elif record.type_name == 'switch_to':
-            pos = _find_job(record,off_cpu)
-            if pos is None:
+            job = off_cpu.pop((record.pid, record.job), None)
+            if job is None:
                 msg = "Event %d tried to switch to a job that was not on the"
                 msg += " off_cpu queue\n"
                 msg = msg % (record.id)
                 sys.stderr.write(msg)
                 exit()
-            job = off_cpu[pos]
-            del off_cpu[pos]
-            on_cpu.append(job)
+            on_cpu[job.pid, job.job] = job
+            eligible.enqueue(job, False)
 
         # Mark a Job as completed.
         # The only time a Job completes when it is not on a
         # CPU is when it is the last job of the task.
         elif record.type_name == 'completion':
-            pos = _find_job(record,on_cpu)
-   	    job = None
-            if pos is not None:
-                on_cpu[pos].is_complete = True
-		job = on_cpu[pos]
-		del on_cpu[pos]
+            job = on_cpu.pop((record.pid, record.job), None)
+            if job is not None:
+                job.is_complete = True
             else:
-                pos = _find_job(record,off_cpu)
-		job = off_cpu[pos]
-                del off_cpu[pos]
+                job = off_cpu.pop((record.pid, record.job))
+            eligible.dequeue(job)
 	    if(record.when > job.deadline):
-		yield Error(job, off_cpu, on_cpu, record.id, record.when)
+		yield Error(job, eligible.queue(True), eligible.queue(False),
+		    record.id, record.when)
 
         # A job is switched away from a CPU. If it has
         # been marked as complete, remove it from the model.
         elif record.type_name == 'switch_away':
-            pos = _find_job(record,on_cpu)
-            if pos is None and record.job:
+            job = on_cpu.pop((record.pid, record.job), None)
+            if job is None and record.job:
                 msg = ("Event %d tried to switch away a job" +
                     " that was not running\n")
                 msg = msg % (record.id)
                 sys.stderr.write(msg)
                 exit()
-            job = on_cpu[pos]
-            del on_cpu[pos]
             if job.is_complete == False:
-                off_cpu.append(job)
+                off_cpu[job.pid, job.job] = job
+                eligible.enqueue(job, True)
+            else:
+                eligible.dequeue(job)
 
         # A job has been blocked.
         elif record.type_name == 'block':
-            pos = _find_job(record,on_cpu)
+            job = on_cpu.get((record.pid, record.job))
             # What if the job is blocked AFTER being switched away?
             # This is a bug in some versions of LITMUS.
-            if pos is None:
-                pos = _find_job(record,off_cpu)
-                job = off_cpu[pos]
-            else:
-                job = on_cpu[pos]
+            if job is None:
+                job = off_cpu[record.pid, record.job]
             job.is_blocked = True
+            eligible.update(job)
 
         # A job is resumed
         elif record.type_name == 'resume':
-            pos = _find_job(record,off_cpu)
-            job = off_cpu[pos]
+            job = off_cpu[record.pid, record.job]
             job.is_blocked = False
+            eligible.update(job)
 
         last_time = record.when
         yield record
@@ -142,18 +142,23 @@ class Job(object):
         self.inversion_end = None
         self.inversion_start_id = None
         self.inversion_start_triggering_event_id = None
+        self.queued = None
+        self.priority = None
     def __str__(self):
         return "(%d.%d:%d)" % (self.pid,self.job,self.deadline)
 
-# G-EDF errors: the start or end of an inversion / deadline misses
+# G-EDF errors: the start or end of an inversion / deadline misses. The
+# off_cpu and on_cpu arguments are tuples of the jobs in each queue, in queue
+# order. They are not copied, so errors raised while the queues are unchanged
+# share them.
 class Error(object):
     id = 0
     def __init__(self, job, off_cpu, on_cpu,first_event_this_timestamp, late_completion = None):
         Error.id += 1
         self.id = Error.id
         self.job = copy.copy(job)
-        self.off_cpu = copy.copy(off_cpu)
-        self.on_cpu = copy.copy(on_cpu)
+        self.off_cpu = off_cpu
+        self.on_cpu = on_cpu
         self.record_type = 'error'
         self.triggering_event_id = first_event_this_timestamp
 	self.late_completion = late_completion
@@ -168,74 +173,140 @@ class Error(object):
             self.inversion_start_id = job.inversion_start_id
             self.inversion_start_triggering_event_id = job.inversion_start_triggering_event_id
 
-# Returns the position of a Job in a list, or None
-def _find_job(record,list):
-    for i in range(0,len(list)):
-        if list[i].pid == record.pid and list[i].job == record.job:
-            return i
-    return None
+# Jobs that are contending for a CPU (neither complete nor blocked), kept
+# sorted by priority, along with the order of the on_cpu and off_cpu queues.
+# Each job in the model has a queued attribute, holding (off_cpu, stamp)
+# while it is in a queue, where stamp gives the order the jobs were added to
+# their queue in. A contending job also has a priority attribute, holding
+# (deadline, off_cpu, stamp): jobs are ordered by deadline with preference to
+# those actually running, and then by queue order.
+#
+# The G-EDF check only needs to look at the jobs that have changed since the
+# last check, and at those that have entered or left the top m. Jobs that are
+# in neither group are still in the state the last check left them in.
+class EligibleJobs(object):
+    def __init__(self):
+        self.priorities = []    # Sorted list of (priority, job)
+        self.dirty = set()      # Jobs changed since the last check
+        self.top = set()        # The top m jobs at the last check
+        self.stamp = 0
+        # (stamp, job) for each job added to the on_cpu (False) and off_cpu
+        # (True) queues, in order, including jobs that have left since
+        self.order = {False: [], True: []}
+        self.size = {False: 0, True: 0}
+        # Tuples of the jobs in each queue, shared by error records until the
+        # queue changes
+        self.snapshots = {False: None, True: None}
+
+    # A job was added to a queue, at the end
+    def enqueue(self, job, off_cpu):
+        self.stamp += 1
+        self._leave(job)
+        job.queued = (off_cpu, self.stamp)
+        self.order[off_cpu].append((self.stamp, job))
+        self.size[off_cpu] += 1
+        self.snapshots[off_cpu] = None
+        self.update(job)
+
+    # A job was removed from the model
+    def dequeue(self, job):
+        self._leave(job)
+        job.queued = None
+        self.update(job)
+
+    # A job was added, removed, blocked or resumed
+    def update(self, job):
+        if job.priority is not None:
+            pos = bisect.bisect_left(self.priorities, (job.priority,))
+            del self.priorities[pos]
+            job.priority = None
+        if (job.queued is not None and job.is_complete is not True and
+                job.is_blocked is not True):
+            job.priority = (job.deadline,) + job.queued
+            bisect.insort(self.priorities, (job.priority, job))
+        self.dirty.add(job)
+
+    # Return a tuple of the jobs in the off_cpu queue (or the on_cpu queue), in
+    # queue order. The same tuple is returned until the queue changes.
+    def queue(self, off_cpu):
+        if self.snapshots[off_cpu] is None:
+            self.snapshots[off_cpu] = tuple([job for stamp, job in
+                self.order[off_cpu] if job.queued == (off_cpu, stamp)])
+        return self.snapshots[off_cpu]
+
+    # A job is leaving its queue. Once most of the order of a queue is jobs
+    # that have left, it is compacted.
+    def _leave(self, job):
+        if job.queued is not None:
+            off_cpu = job.queued[0]
+            self.size[off_cpu] -= 1
+            self.snapshots[off_cpu] = None
+            if len(self.order[off_cpu]) > 2 * self.size[off_cpu] + 64:
+                self.order[off_cpu] = [(stamp, x) for stamp, x in
+                    self.order[off_cpu] if x.queued == (off_cpu, stamp)]
+
+    # Return the jobs to check: the top m jobs, in order of priority; the
+    # other contending jobs that may have changed, in order of priority; and
+    # the blocked jobs that may have changed, in queue order (on_cpu first)
+    def changed(self, m):
+        top = set(job for priority, job in self.priorities[:m])
+        jobs = self.dirty.union(self.top, top)
+        self.dirty = set()
+        self.top = top
+        contending = [job for job in jobs if job.priority is not None]
+        contending.sort(key=lambda job: job.priority)
+        blocked = [job for job in jobs if job.priority is None and
+            job.queued is not None and job.is_blocked]
+        blocked.sort(key=lambda job: job.queued)
+        return ([job for job in contending if job in top],
+            [job for job in contending if job not in top], blocked)
 
 # Return records for any inversion_starts and inversion_ends
-def _gedf_check(off_cpu,on_cpu,when,m,first_event_this_timestamp):
+def _gedf_check(off_cpu,on_cpu,eligible,when,m,first_event_this_timestamp):
 
     # List of error records to be returned
     errors = []
 
-    # List of all jobs that are contending for the CPU (neither complete nor
-    # blocked)
-    all = []
-    for x in on_cpu:
-        if x.is_complete is not True and x.is_blocked is not True:
-            all.append(x)
-    for x in off_cpu:
-        if x.is_blocked is not True:
-            all.append(x)
-
-    # Sort by on_cpu and then by deadline. sort() is guaranteed to be stable.
-    # Thus, this gives us jobs ordered by deadline with preference to those
-    # actually running.
-    all.sort(key=lambda x: 0 if (x in on_cpu) else 1)
-    all.sort(key=lambda x: x.deadline)
+    # Jobs that may have started or ended an inversion since the last check
+    top, others, blocked = eligible.changed(m)
+
+    def error(job):
+        return Error(job, eligible.queue(True), eligible.queue(False),
+            first_event_this_timestamp)
 
     # Check those that actually should be running, to look for priority
     # inversions
-    for x in range(0,min(m,len(all))):
-        job = all[x]
+    for job in top:
 
         # It's not running and an inversion_start has not been recorded
-        if job not in on_cpu and job.inversion_start is None:
+        if (job.pid, job.job) not in on_cpu and job.inversion_start is None:
             job.inversion_start = when
-            errors.append(Error(job, off_cpu, on_cpu,
-                first_event_this_timestamp))
+            errors.append(error(job))
 
         # It is running and an inversion_start exists (i.e. it it still
         # marked as being inverted)
-        elif job in on_cpu and job.inversion_start is not None:
+        elif (job.pid, job.job) in on_cpu and job.inversion_start is not None:
             job.inversion_end = when
-            errors.append(Error(job, off_cpu, on_cpu,
-                first_event_this_timestamp))
+            errors.append(error(job))
             job.inversion_start = None
             job.inversion_end = None
 
     # Check those that actually should not be running, to record the end of any
     # priority inversions
-    for x in range(m,len(all)):
-        job = all[x]
-        if job not in on_cpu and job.inversion_start is not None:
+    for job in others:
+        if ((job.pid, job.job) not in on_cpu and
+                job.inversion_start is not None):
             job.inversion_end = when
-            errors.append(Error(job, off_cpu, on_cpu,
-                first_event_this_timestamp))
+            errors.append(error(job))
             job.inversion_start = None
             job.inversion_end = None
 
     # Look for priority inversions among blocked tasks and end them
-    all = filter(lambda x:x.is_blocked and x.inversion_start is not None,
-        on_cpu + off_cpu)
-    for job in all:
-        job.inversion_end = when
-        errors.append(Error(job, off_cpu, on_cpu,
-            first_event_this_timestamp))
-        job.inversion_start = None
-        job.inversion_end = None
+    for job in blocked:
+        if job.inversion_start is not None:
+            job.inversion_end = when
+            errors.append(error(job))
+            job.inversion_start = None
+            job.inversion_end = None
 
     return errors
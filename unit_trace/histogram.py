@@ -0,0 +1,134 @@
+###############################################################################
+# Description
+###############################################################################
+
+# Log-linear histograms, for summarizing a stream of non-negative integers
+# (e.g. inversion lengths) in fixed memory.
+#
+# Values below 2**SUB_BUCKET_BITS each get a bucket of their own. Above that,
+# every power of two is split into 2**SUB_BUCKET_BITS buckets of equal width,
+# so a bucket is never wider than 1/2**SUB_BUCKET_BITS of the values in it
+# (under 1% with the default of 7 bits). Only non-empty buckets are stored,
+# and there are at most 2**SUB_BUCKET_BITS per power of two, however many
+# values are added.
+#
+# Histograms can be merged, e.g. to combine the results of several traces, and
+# converted to and from plain dicts, e.g. to be saved as JSON.
+
+###############################################################################
+# Imports
+###############################################################################
+
+import math
+
+###############################################################################
+# Public functions
+###############################################################################
+
+SUB_BUCKET_BITS = 7
+
+class LogLinearHistogram(object):
+
+    def __init__(self):
+        self.counts = {}    # Count of values in each bucket, by bucket index
+        self.count = 0      # Number of values
+        self.total = 0      # Sum of the values
+        self.min = None     # Smallest value
+        self.max = None     # Largest value
+
+    # Add a value
+    def add(self, value, count=1):
+        index = _get_index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    # Add all the values of another histogram
+    def merge(self, other):
+        for index, count in other.counts.iteritems():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    # Return the value at quantile q (between 0 and 1), that is, the largest
+    # value in the bucket holding the value of rank q * count (within the
+    # range of values seen). Returns 0 if the histogram is empty.
+    def quantile(self, q):
+        if self.count == 0:
+            return 0
+        rank = max(1, int(math.ceil(q * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = _get_bounds(index)
+                return max(self.min, min(self.max, high - 1))
+        return self.max
+
+    # Return (low, high, count) for each power of two holding values, in
+    # order, where values from low up to (but not including) high are counted
+    def log_buckets(self):
+        counts = {}
+        for index, count in self.counts.iteritems():
+            low, high = _get_bounds(index)
+            exponent = low.bit_length() - 1
+            counts[exponent] = counts.get(exponent, 0) + count
+        buckets = []
+        for exponent in sorted(counts):
+            if exponent < 0:
+                buckets.append((0, 1, counts[exponent]))
+            else:
+                buckets.append((1 << exponent, 2 << exponent,
+                    counts[exponent]))
+        return buckets
+
+    # Return the histogram as a dict of plain values (e.g. for JSON)
+    def to_dict(self):
+        return {'sub_bucket_bits': SUB_BUCKET_BITS,
+            'counts': sorted(self.counts.items()),
+            'count': self.count, 'total': self.total,
+            'min': self.min, 'max': self.max}
+
+    # Return a histogram made from the output of to_dict
+    @staticmethod
+    def from_dict(data):
+        if data['sub_bucket_bits'] != SUB_BUCKET_BITS:
+            raise ValueError("Histogram uses %d sub-bucket bits instead of %d"
+                % (data['sub_bucket_bits'], SUB_BUCKET_BITS))
+        histogram = LogLinearHistogram()
+        for index, count in data['counts']:
+            histogram.counts[int(index)] = count
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+###############################################################################
+# Private functions
+###############################################################################
+
+# Return the index of the bucket of a value
+def _get_index(value):
+    if value < (1 << SUB_BUCKET_BITS):
+        return max(value, 0)
+    shift = value.bit_length() - 1 - SUB_BUCKET_BITS
+    return ((shift + 1) << SUB_BUCKET_BITS) + (value >> shift) - \
+        (1 << SUB_BUCKET_BITS)
+
+# Return the (low, high) bounds of the values in a bucket (high not included)
+def _get_bounds(index):
+    if index < (1 << SUB_BUCKET_BITS):
+        return (index, index + 1)
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    sub = index & ((1 << SUB_BUCKET_BITS) - 1)
+    low = (sub + (1 << SUB_BUCKET_BITS)) << shift
+    return (low, low + (1 << shift))
@@ -11,6 +11,8 @@
 import copy
 import sys
 
+from unit_trace.gedf_test import EligibleJobs
+
 
 ###############################################################################
 # Public Functions
@@ -20,9 +22,17 @@ task_partition = dict()	# Partitions of each task
 
 def pedf_test(stream):
 
-    # System model
+    # System model. Each partition has its own queues, with jobs keyed by
+    # (pid, job), and its own EligibleJobs (see gedf_test.py), which keeps
+    # the order of the queues and the priorities of the jobs.
     on_cpu = []     # Tasks on a CPU
     off_cpu = []    # Tasks not on a CPU
+    eligible = []   # Jobs contending for a CPU, by priority
+
+    # Partitions changed since the last check, and the jobs found on the
+    # wrong partition by the last check of each partition
+    dirty = set()
+    wrong = {}
 
     m = None        # CPUs
     timer_resolution = 1000000	    # Resolution of gaps between jobs
@@ -42,12 +52,14 @@ def pedf_test(stream):
             if record.record_type == "meta" and record.type_name == "num_cpus":
                 m = record.num_cpus
 		for partition in range(m):
-		    on_cpu.append([])
-		    off_cpu.append([])
+		    on_cpu.append({})
+		    off_cpu.append({})
+		    eligible.append(EligibleJobs())
             continue
 	
 	if record.type_name == "params":
 	    task_partition[record.pid] = record.partition
+	    dirty.update(range(len(eligible)))
 	    continue
 
 	# Skip the initial setup jobs
@@ -60,78 +72,79 @@ def pedf_test(stream):
         # so we only check when the time has moved forward)
         # Also, need to update the first_event_this_timestamp variable
         if last_time is not None and (last_time // timer_resolution) != (record.when // timer_resolution):
-            errors = _pedf_check(off_cpu,on_cpu,last_time,m,
+            errors = _pedf_check(eligible,dirty,wrong,last_time,m,
                 record.id - 1)
             first_event_this_timestamp = record.id
             for error in errors:
                 yield error
 
+        queue = eligible[record.cpu]
+        key = (record.pid, record.job)
+        dirty.add(record.cpu)
+
         # Add a newly-released Job to the off_cpu queue
         if record.type_name == 'release':
-            off_cpu[record.cpu].append(Job(record))
+            job = Job(record)
+            off_cpu[record.cpu][key] = job
+            queue.enqueue(job, True)
 
         # Move a Job from the off_cpu queue to on_cpu
         elif record.type_name == 'switch_to':
-            pos = _find_job(record,off_cpu[record.cpu])
-            if pos is None:
+            job = off_cpu[record.cpu].pop(key, None)
+            if job is None:
                 msg = "Event %d tried to switch to a job that was not on the"
                 msg += " off_cpu queue\n"
                 msg = msg % (record.id)
                 sys.stderr.write(msg)
                 exit()
-            job = off_cpu[record.cpu][pos]
-            del off_cpu[record.cpu][pos]
-            on_cpu[record.cpu].append(job)
+            on_cpu[record.cpu][key] = job
+            queue.enqueue(job, False)
 
         # Mark a Job as completed.
         # The only time a Job completes when it is not on a
         # CPU is when it is the last job of the task.
         elif record.type_name == 'completion':
-            pos = _find_job(record,on_cpu[record.cpu])
-   	    job = None
-            if pos is not None:
-                on_cpu[record.cpu][pos].is_complete = True
-		job = on_cpu[record.cpu][pos]
-		del on_cpu[record.cpu][pos]
+            job = on_cpu[record.cpu].pop(key, None)
+            if job is not None:
+                job.is_complete = True
             else:
-                pos = _find_job(record,off_cpu[record.cpu])
-		job = off_cpu[record.cpu][pos]
-                del off_cpu[record.cpu][pos]
-	    if(record.when > job.deadline):
-		yield Error(job, off_cpu[record.cpu], on_cpu[record.cpu], record.id, record.when)
+                job = off_cpu[record.cpu].pop(key)
+            queue.dequeue(job)
+            if(record.when > job.deadline):
+                yield Error(job, queue.queue(True), queue.queue(False),
+                    record.id, record.when)
 
         # A job is switched away from a CPU. If it has
         # been marked as complete, remove it from the model.
         elif record.type_name == 'switch_away':
-            pos = _find_job(record,on_cpu[record.cpu])
-            if pos is None and record.job:
+            job = on_cpu[record.cpu].pop(key, None)
+            if job is None and record.job:
                 msg = ("Event %d tried to switch away a job" +
                     " that was not running\n")
                 msg = msg % (record.id)
                 sys.stderr.write(msg)
                 exit()
-            job = on_cpu[record.cpu][pos]
-            del on_cpu[record.cpu][pos]
             if job.is_complete == False:
-                off_cpu[record.cpu].append(job)
+                off_cpu[record.cpu][key] = job
+                queue.enqueue(job, True)
+            else:
+                queue.dequeue(job)
 
         # A job has been blocked.
         elif record.type_name == 'block':
-            pos = _find_job(record,on_cpu[record.cpu])
+            job = on_cpu[record.cpu].get(key)
             # What if the job is blocked AFTER being switched away?
             # This is a bug in some versions of LITMUS.
-            if pos is None:
-                pos = _find_job(record,off_cpu[record.cpu])
-                job = off_cpu[record.cpu][pos]
-            else:
-                job = on_cpu[record.cpu][pos]
+            if job is None:
+                job = off_cpu[record.cpu][key]
             job.is_blocked = True
+            queue.update(job)
 
         # A job is resumed
         elif record.type_name == 'resume':
-            pos = _find_job(record,off_cpu[record.cpu])
-            job = off_cpu[record.cpu][pos]
+            job = off_cpu[record.cpu][key]
             job.is_blocked = False
+            queue.update(job)
 
         last_time = record.when
         yield record
@@ -153,18 +166,24 @@ class Job(object):
         self.inversion_start_id = None
         self.inversion_start_triggering_event_id = None
 	self.partition = record.cpu
+        self.queued = None
+        self.priority = None
     def __str__(self):
         return "(%d.%d:%d on %d)" % (self.pid,self.job,self.deadline, self.partition)
 
-# P-EDF errors: the start or end of an inversion / deadline misses
+# P-EDF errors: the start or end of an inversion / deadline misses / jobs on
+# the wrong partition. The off_cpu and on_cpu queues are tuples (see
+# EligibleJobs.queue), which are shared instead of copied. when is the
+# timestamp of the records that triggered the error.
 class Error(object):
     id = 0
-    def __init__(self, job, off_cpu, on_cpu,first_event_this_timestamp, late_completion = None, partition = None):
+    def __init__(self, job, off_cpu, on_cpu,first_event_this_timestamp, late_completion = None, partition = None, when = None):
         Error.id += 1
         self.id = Error.id
+        self.when = when
         self.job = copy.copy(job)
-        self.off_cpu = copy.copy(off_cpu)
-        self.on_cpu = copy.copy(on_cpu)
+        self.off_cpu = off_cpu
+        self.on_cpu = on_cpu
         self.record_type = 'error'
         self.triggering_event_id = first_event_this_timestamp
 	self.late_completion = late_completion
@@ -182,81 +201,68 @@ class Error(object):
             self.inversion_start_id = job.inversion_start_id
             self.inversion_start_triggering_event_id = job.inversion_start_triggering_event_id
 
-# Returns the position of a Job in a list, or None
-def _find_job(record,list):
-    for i in range(0,len(list)):
-        if list[i].pid == record.pid and list[i].job == record.job:
-            return i
-    return None
-
-# Return records for any inversion_starts and inversion_ends
-def _pedf_check(off,on,when,m,first_event_this_timestamp):
+# Return records for any inversion_starts and inversion_ends, and for jobs on
+# the wrong partition. Only the partitions that have changed since the last
+# check are checked again; the others can only still have the same jobs on the
+# wrong partition.
+def _pedf_check(eligible,dirty,wrong,when,m,first_event_this_timestamp):
 
     # List of error records to be returned
     errors = []
-    for part in range(m):
-    	# List of all jobs that are contending for the CPU (neither complete nor
-	# blocked)
-	on_cpu = on[part]
-	off_cpu = off[part]
-	all = []
-	for x in on_cpu:
-	    if x.is_complete is not True and x.is_blocked is not True:
-	        all.append(x)
-	for x in off_cpu:
-	    if x.is_blocked is not True:
-        	all.append(x)
-	
-	# Sort by on_cpu and then by deadline. sort() is guaranteed to be stable.
-	# Thus, this gives us jobs ordered by deadline with preference to those
-	# actually running.
-	all.sort(key=lambda x: 0 if (x in on_cpu) else 1)
-	all.sort(key=lambda x: x.deadline)
-	
-	# Check if any job is on the wrong partition
-	for x in all:
-	    if x.partition != task_partition[x.pid]:
-		errors.append(Error(x, off_cpu, on_cpu, first_event_this_timestamp, None, task_partition[x.pid]))
-
-	# Check those that actually should be running, to look for priority
-	# inversions
-	for x in range(0,min(m,len(all))):
-	    job = all[x]
-	
-	    # It's not running and an inversion_start has not been recorded
-	    if job not in on_cpu and job.inversion_start is None:
-	        job.inversion_start = when
-	        errors.append(Error(job, off_cpu, on_cpu,
-	        first_event_this_timestamp))
-	
-	    # It is running and an inversion_start exists (i.e. it it still
-	    # marked as being inverted)
-	    elif job in on_cpu and job.inversion_start is not None:
-	        job.inversion_end = when
-	        errors.append(Error(job, off_cpu, on_cpu,
-	             first_event_this_timestamp))
+    for part in sorted(dirty.union(wrong)):
+        queue = eligible[part]
+        def error(job, partition=None):
+            return Error(job, queue.queue(True), queue.queue(False),
+                first_event_this_timestamp, None, partition, when)
+
+        # Find the jobs on the wrong partition, in order of priority
+        if part in dirty:
+            wrong[part] = [x for priority, x in queue.priorities
+                if x.partition != task_partition[x.pid]]
+            if len(wrong[part]) == 0:
+                del wrong[part]
+        for x in wrong.get(part, []):
+            errors.append(error(x, task_partition[x.pid]))
+        if part not in dirty:
+            continue
+
+        # Jobs that may have started or ended an inversion since the last
+        # check
+        top, others, blocked = queue.changed(m)
+
+        # Check those that actually should be running, to look for priority
+        # inversions
+        for job in top:
+
+            # It's not running and an inversion_start has not been recorded
+            if job.queued[0] and job.inversion_start is None:
+                job.inversion_start = when
+                errors.append(error(job))
+
+            # It is running and an inversion_start exists (i.e. it it still
+            # marked as being inverted)
+            elif not job.queued[0] and job.inversion_start is not None:
+                job.inversion_end = when
+                errors.append(error(job))
                 job.inversion_start = None
-	        job.inversion_end = None
-	
-	# Check those that actually should not be running, to record the end of any
-	# priority inversions
-	for x in range(m,len(all)):
-	    job = all[x]
-	    if job not in on_cpu and job.inversion_start is not None:
+                job.inversion_end = None
+
+        # Check those that actually should not be running, to record the end
+        # of any priority inversions
+        for job in others:
+            if job.queued[0] and job.inversion_start is not None:
                 job.inversion_end = when
-	        errors.append(Error(job, off_cpu, on_cpu,
-        	        first_event_this_timestamp))
-	        job.inversion_start = None
-	        job.inversion_end = None
-	
-	# Look for priority inversions among blocked tasks and end them
-	all = filter(lambda x:x.is_blocked and x.inversion_start is not None,
-	    on_cpu + off_cpu)
-	for job in all:
-	    job.inversion_end = when
-	    errors.append(Error(job, off_cpu, on_cpu,
-	        first_event_this_timestamp))
-	    job.inversion_start = None
-	    job.inversion_end = None
+                errors.append(error(job))
+                job.inversion_start = None
+                job.inversion_end = None
+
+        # Look for priority inversions among blocked tasks and end them
+        for job in blocked:
+            if job.inversion_start is not None:
+                job.inversion_end = when
+                errors.append(error(job))
+                job.inversion_start = None
+                job.inversion_end = None
 
+    dirty.clear()
     return errors
@@ -5,9 +5,18 @@
 # Display progress information:
 # - Total number of bytes in trace files
 # - Total number of event records in trace files
-# - Message for every 1,000 records processed
+# - Every PROGRESS_INTERVAL seconds: records processed, the fraction of the
+#   trace files read, the rate in records/s and MB/s, and the estimated time
+#   left
 # - Total records processed
-# - Total elapsed time
+# - Total elapsed time, and the average rates
+#
+# The position in the trace files is the number of bytes the reader has
+# consumed from each of them (see trace_reader.py), so the fraction read and
+# the estimated time left stay accurate when reading starts partway through
+# the files (e.g. with -t) or when records are skipped. The clock is only read
+# every PROGRESS_CHECK records, so progress costs little more than passing the
+# records on.
 
 ###############################################################################
 # Imports
@@ -17,30 +26,89 @@ import time
 import sys
 import os
 
+from unit_trace import trace_reader
+
 ###############################################################################
 # Public functions
 ###############################################################################
 
-def progress(stream):
+PROGRESS_INTERVAL = 1.0
+PROGRESS_CHECK = 1024
+
+def progress(stream, interval=PROGRESS_INTERVAL):
 
-    start_time = 0
+    start_time = time.time()
     count = 0
+    countdown = PROGRESS_CHECK
+
+    # State for the reports: total bytes to read, the byte positions reached
+    # in the trace files, and the record count, bytes read and time of the
+    # last report
+    total = 0
+    positions = None
+    start_bytes = 0
+    last = (0, 0, start_time)
 
     for record in stream:
-        if record.record_type=="event":
+        if record.record_type == "event":
             count += 1
-        if (count % 1000) == 0 and count > 0:
-            sys.stderr.write(("Parsed %d event records\n") % (count))
-        if record.record_type=="meta" and record.type_name=="trace_files":
-            bytes = 0
+        elif record.type_name == "trace_files":
+            total = 0
             for file in record.files:
-                bytes += int(os.path.getsize(file))
-            sys.stderr.write(("Total bytes  : %d\n") % (bytes))
-            # 192 bits per event record, 8 bits per byte
-            sys.stderr.write(("Total records: %d\n") % (bytes * 8 / 192))
+                total += int(os.path.getsize(file))
+            sys.stderr.write(("Total bytes  : %d\n") % (total))
+            sys.stderr.write(("Total records: %d\n") %
+                (total / trace_reader.RECORD_HEAD_SIZE))
+            positions = record.positions
+            if positions is not None:
+                start_bytes = sum(positions)
+                total -= start_bytes
             start_time = time.time()
+            last = (count, 0, start_time)
+
+        countdown -= 1
+        if countdown == 0:
+            countdown = PROGRESS_CHECK
+            now = time.time()
+            if now - last[2] >= interval:
+                bytes = _get_bytes(positions, start_bytes, count)
+                _write_report(count, bytes, total, start_time, last, now)
+                last = (count, bytes, now)
+
         yield record
 
+    elapsed = time.time() - start_time
     sys.stderr.write(("Total records processed: %d\n") % (count))
-    sys.stderr.write(("Time elapsed: %ds\n") % (time.time() - start_time))
+    sys.stderr.write(("Time elapsed: %ds\n") % (elapsed))
+    if elapsed > 0:
+        bytes = _get_bytes(positions, start_bytes, count)
+        sys.stderr.write(("Average rate: %d records/s, %.1f MB/s\n") %
+            (count / elapsed, bytes / elapsed / 1e6))
+
+###############################################################################
+# Private functions
+###############################################################################
+
+# Return the number of bytes of the trace files read so far. Without positions
+# (e.g. when reading from the trace cache), every event record counts as one
+# record of the trace files.
+def _get_bytes(positions, start_bytes, count):
+    if positions is None:
+        return count * trace_reader.RECORD_HEAD_SIZE
+    return sum(positions) - start_bytes
 
+# Write a progress report. The rates are over the time since the last report,
+# and the time left is estimated from the average rate since the start.
+def _write_report(count, bytes, total, start_time, last, now):
+    last_count, last_bytes, last_time = last
+    elapsed = now - last_time
+    message = "Parsed %d event records" % (count)
+    if total > 0:
+        message += " (%.1f%%)" % (min(100.0, 100.0 * bytes / total))
+    message += ", %d records/s, %.1f MB/s" % ((count - last_count) / elapsed,
+        (bytes - last_bytes) / elapsed / 1e6)
+    if bytes > 0 and total > bytes:
+        left = int((total - bytes) * (now - start_time) / bytes)
+        message += ", ETA %d:%02d:%02d" % (left / 3600, left / 60 % 60,
+            left % 60)
+    sys.stderr.write(message + "\n")
@@ -4,6 +4,19 @@
 
 # Sanitize input. (There are a number of goofy issues with the sched_trace
 # output.)
+#
+# A switch_away can name any job of its task, so whether a job has ever been
+# switched to is remembered for the whole trace. The jobs of a task that have
+# been switched to are kept as a sorted list of runs of consecutive job
+# numbers, so memory use grows with the number of gaps in them (jobs that were
+# never switched to) rather than with the length of the trace.
+
+###############################################################################
+# Imports
+###############################################################################
+
+import bisect
+import sys
 
 ###############################################################################
 # Public functions
@@ -11,8 +24,8 @@
 
 def sanitizer(stream):
 
-    job_2s_released = [] # list of tasks which have released their job 2s
-    jobs_switched_to = []
+    job_2s_released = set() # tasks which have released their job 2s
+    jobs_switched_to = {}   # pid -> runs of jobs which have been switched to
 
     released = False
 
@@ -43,7 +56,7 @@ def sanitizer(stream):
                 if record.pid in job_2s_released:
                     continue
                 else:
-                    job_2s_released.append(record.pid)
+                    job_2s_released.add(record.pid)
 
             # Job 2 has a resume that is garbage
             if record.type_name == 'resume':
@@ -54,10 +67,33 @@ def sanitizer(stream):
         # We can correct this if we note which jobs really
         # have been switched to.
         if record.type_name == 'switch_to':
-            jobs_switched_to.append((record.pid,record.job))
+            _add_job(jobs_switched_to.setdefault(record.pid, []), record.job)
         if record.type_name == 'switch_away':
-            if (record.pid,record.job) not in jobs_switched_to:
+            if not _has_job(jobs_switched_to.get(record.pid, []), record.job):
                 record.job -= 1
 
-
         yield record
+
+###############################################################################
+# Private functions
+###############################################################################
+
+# Add a job to a sorted list of [first, last] runs of job numbers, extending or
+# joining the runs next to it
+def _add_job(runs, job):
+    i = bisect.bisect_right(runs, [job, sys.maxint]) - 1
+    if i >= 0 and runs[i][1] >= job:
+        return
+    if i >= 0 and runs[i][1] == job - 1:
+        runs[i][1] = job
+    else:
+        i += 1
+        runs.insert(i, [job, job])
+    if i + 1 < len(runs) and runs[i + 1][0] == job + 1:
+        runs[i][1] = runs[i + 1][1]
+        del runs[i + 1]
+
+# Return whether a job is in a sorted list of [first, last] runs of job numbers
+def _has_job(runs, job):
+    i = bisect.bisect_right(runs, [job, sys.maxint]) - 1
+    return i >= 0 and runs[i][1] >= job
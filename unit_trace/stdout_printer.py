@@ -3,86 +3,123 @@
 ###############################################################################
 
 # Prints records to standard out
+#
+# Each record is formatted into a single string, from a format template for
+# its type, and written with a single write. The text is the same as printing
+# each line with a print statement would give, including the spaces print
+# adds between the jobs of a queue.
+
+###############################################################################
+# Imports
+###############################################################################
+
+import sys
 
 ###############################################################################
 # Public functions
 ###############################################################################
 
 def stdout_printer(stream):
+    printer = StdoutPrinter()
     for record in stream:
+        printer.process(record)
+    printer.finish()
+
+# Sink for the dispatcher (see dispatcher.py), printing each record as it
+# comes
+class StdoutPrinter(object):
+
+    def __init__(self):
+        self.write = sys.stdout.write
+
+    def process(self, record):
         if record.record_type == "event":
-            _print_event(record)
+            self.write(_format_event(record))
         elif record.record_type == "meta" and record.type_name == "stats":
             _print_stats(record)
+            print ""
         elif record.record_type == "error" and record.type_name == 'inversion_start':
-            _print_inversion_start(record)
+            self.write(_format_inversion_start(record))
         elif record.record_type == "error" and record.type_name == 'inversion_end':
-            _print_inversion_end(record)
-	elif record.record_type == "error" and record.type_name == 'miss_deadline':
-	    _print_miss_deadline(record)
-	elif record.record_type == "error" and record.type_name == 'wrong_partition':
-	    _print_wrong_partition(record)
-        else:
-            continue
-        print ""
+            self.write(_format_inversion_end(record))
+        elif record.record_type == "error" and record.type_name == 'miss_deadline':
+            self.write(_format_miss_deadline(record))
+        elif record.record_type == "error" and record.type_name == 'wrong_partition':
+            self.write(_format_wrong_partition(record))
+
+    def finish(self):
+        pass
 
 ###############################################################################
 # Private functions
 ###############################################################################
 
-def _print_event(record):
-    print "Event ID: %d" % (record.id)
-    print "Job: %d.%d" % (record.pid,record.job)
-    print "Type: %s" % (record.type_name)
-    print "Time: %d" % (record.when)
-    print "CPU: %d" % (record.cpu)
-
-def _print_inversion_start(record):
-    print "Type: %s" % ("Inversion start")
-    print "Inversion Record IDs: (%d, U)" % (record.id)
-    print "Triggering Event IDs: (%d, U)" % (record.triggering_event_id)
-    print "Time: %d" % (record.job.inversion_start)
-    print "Job: %d.%d" % (record.job.pid,record.job.job)
-    print "Deadline: %d" % (record.job.deadline)
-    print "Off CPU: ",
-    for job in record.off_cpu:
-        print str(job) + " ",
-    print
-    print "On CPU: ",
-    for job in record.on_cpu:
-        print str(job) + " ",
-    print #newline
-
-def _print_inversion_end(record):
-    print "Type: %s" % ("Inversion end")
-    print "Inversion record IDs: (%d, %d)" % (record.inversion_start_id,
-        record.id)
-    print("Triggering Event IDs: (%d, %d)" %
-        (record.inversion_start_triggering_event_id,
-        record.triggering_event_id))
-    print "Time: %d" % (record.job.inversion_end)
-    # NOTE: Here, we assume nanoseconds as the time unit.
-    # May have to be changed in the future.
-    print "Duration: %f ms" % (
-        float(record.job.inversion_end - record.job.inversion_start)/1000000)
-    print "Job: %d.%d" % (record.job.pid,record.job.job)
-    print "Deadline: %d" % (record.job.deadline)
-    print "Off CPU: ",
-    for job in record.off_cpu:
-        print str(job) + " ",
-    print
-    print "On CPU: ",
-    for job in record.on_cpu:
-        print str(job) + " ",
-    print #newline
-
-def _print_miss_deadline(record):
-    print "Type: %s" % ("Miss deadline")
-    print "Job: %d.%d" % (record.job.pid, record.job.job)
-    print("Deadline: %d" % (record.job.deadline))
-    print("Completion time: %d" % (record.late_completion))
-
-def _print_wrong_partition(record):
-    print "Type: %s" % ("Wrong partition")
-    print "Job: %d.%d" % (record.job.pid, record.job.job)
-    print "Description: Should be on %d, but is currently on %d" % (record.partition, record.job.partition)
+# Format templates for each type of record. Each ends with the blank line that
+# separates records.
+
+_EVENT_FORMAT = ("Event ID: %d\n"
+    "Job: %d.%d\n"
+    "Type: %s\n"
+    "Time: %d\n"
+    "CPU: %d\n\n")
+
+_INVERSION_START_FORMAT = ("Type: Inversion start\n"
+    "Inversion Record IDs: (%d, U)\n"
+    "Triggering Event IDs: (%d, U)\n"
+    "Time: %d\n"
+    "Job: %d.%d\n"
+    "Deadline: %d\n"
+    "Off CPU: %s\n"
+    "On CPU: %s\n\n")
+
+# NOTE: Here, we assume nanoseconds as the time unit.
+# May have to be changed in the future.
+_INVERSION_END_FORMAT = ("Type: Inversion end\n"
+    "Inversion record IDs: (%d, %d)\n"
+    "Triggering Event IDs: (%d, %d)\n"
+    "Time: %d\n"
+    "Duration: %f ms\n"
+    "Job: %d.%d\n"
+    "Deadline: %d\n"
+    "Off CPU: %s\n"
+    "On CPU: %s\n\n")
+
+_MISS_DEADLINE_FORMAT = ("Type: Miss deadline\n"
+    "Job: %d.%d\n"
+    "Deadline: %d\n"
+    "Completion time: %d\n\n")
+
+_WRONG_PARTITION_FORMAT = ("Type: Wrong partition\n"
+    "Job: %d.%d\n"
+    "Description: Should be on %d, but is currently on %d\n\n")
+
+def _format_event(record):
+    return _EVENT_FORMAT % (record.id, record.pid, record.job,
+        record.type_name, record.when, record.cpu)
+
+def _format_inversion_start(record):
+    return _INVERSION_START_FORMAT % (record.id, record.triggering_event_id,
+        record.job.inversion_start, record.job.pid, record.job.job,
+        record.job.deadline, _format_queue(record.off_cpu),
+        _format_queue(record.on_cpu))
+
+def _format_inversion_end(record):
+    return _INVERSION_END_FORMAT % (record.inversion_start_id, record.id,
+        record.inversion_start_triggering_event_id,
+        record.triggering_event_id, record.job.inversion_end,
+        float(record.job.inversion_end - record.job.inversion_start)/1000000,
+        record.job.pid, record.job.job, record.job.deadline,
+        _format_queue(record.off_cpu), _format_queue(record.on_cpu))
+
+def _format_miss_deadline(record):
+    return _MISS_DEADLINE_FORMAT % (record.job.pid, record.job.job,
+        record.job.deadline, record.late_completion)
+
+def _format_wrong_partition(record):
+    return _WRONG_PARTITION_FORMAT % (record.job.pid, record.job.job,
+        record.partition, record.job.partition)
+
+# Format the jobs of a queue. Each job is followed by a space, and preceded by
+# the space a print statement would put after the previous item.
+def _format_queue(queue):
+    return "".join([" %s " % (job,) for job in queue])
@@ -0,0 +1,51 @@
+###############################################################################
+# Description
+###############################################################################
+
+# Enforce a window of timestamps. Unlike earliest and latest, which work on
+# record IDs, this looks at the 'when' of each event record.
+
+###############################################################################
+# Imports
+###############################################################################
+
+from unit_trace import trace_index
+from unit_trace import trace_reader
+
+###############################################################################
+# Public functions
+###############################################################################
+
+# Filter a stream down to the event records with a timestamp between
+# start_time and end_time (inclusive). An end_time of None means there is no
+# end. Event records without a timestamp (such as name and params records) and
+# non-event records are all passed through. Records come in order of time,
+# give or take the reorder window of the merge (see trace_reader), so the
+# stream is not read any further once buffsize records past end_time have
+# followed the first one, with no record from the window in between.
+def time_window(stream, start_time, end_time, buffsize):
+    past = 0
+    for record in stream:
+        if (record.record_type == "event" and
+                trace_reader.has_timestamp(record.type_num)):
+            if end_time is not None and record.when > end_time:
+                past += 1
+                if past > buffsize:
+                    break
+                continue
+            past = 0
+            if record.when < start_time:
+                continue
+        yield record
+
+# Read the event records with a timestamp between start_time and end_time from
+# trace files, without reading the trace files from the start. The reader
+# resumes from the last checkpoint of the index (see trace_index.py) before
+# start_time, so records get the same IDs as when reading the whole trace.
+# The index is built the first time it is needed.
+def time_window_reader(files, buffsize, start_time, end_time,
+        decoder='struct'):
+    index = trace_index.get_index(files, buffsize, decoder)
+    checkpoint = index.find_by_time(start_time)
+    stream = trace_reader.trace_reader(files, buffsize, decoder, checkpoint)
+    return time_window(stream, start_time, end_time, buffsize)
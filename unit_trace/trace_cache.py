@@ -0,0 +1,317 @@
+###############################################################################
+# Description
+###############################################################################
+
+# cached_trace_reader(files, buffsize, cache_dir) produces the same records as
+# trace_reader(files, buffsize), but keeps an on-disk, columnar copy of the
+# merged, id-numbered record stream in cache_dir. Later runs over the same
+# trace files memory-map the columns instead of parsing and merging the trace
+# files again, and can start at a given record id or time without going over
+# the records before it.
+#
+# A cache entry is a directory named after a hash of the paths, sizes and
+# modification times of the trace files and of the buffer size, so changing
+# any of them results in a new entry. It holds one NumPy array (.npy file) per
+# column:
+#   - 'type', 'cpu', 'pid', 'job' and 'when': the header and timestamp of
+#       every record, in merged order. Row n has id n + 1. Records without a
+#       timestamp have a 'when' of 0.
+#   - 'rank': the position of every record among the records of its type.
+#   - '<type_name>.<key>' (e.g. 'release.deadline'): each other field of the
+#       records of a type, in merged order, so row 'rank' of it belongs to
+#       the record with that rank. Any '?' is left out of the key.
+#   - 'out_of_order': the ids of the records that were out of order.
+#
+# Records are rebuilt a block of CACHE_BLOCK_SIZE rows at a time, straight
+# from the columns (see trace_reader.build_records). Reading starts at the row
+# of the first id of interest. With a time window, the rows are picked with
+# the 'when' column: every record with a timestamp in the window, and every
+# record without a timestamp. Like time_window.time_window, reading stops once
+# buffsize records past the end of the window have followed the first one.
+#
+# The first run writes the raw records to the entry as it reads them, and
+# splits them into columns once the whole stream has been read. An
+# interrupted run (or one cut short by e.g. the maxer) leaves no entry behind.
+# If the first run starts at some id or time, it builds the whole entry first,
+# and then reads from it. The cache requires NumPy.
+
+###############################################################################
+# Imports
+###############################################################################
+
+import hashlib
+import os
+import shutil
+import sys
+
+from unit_trace import trace_reader
+from unit_trace import time_window
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+###############################################################################
+# Public functions
+###############################################################################
+
+# Return the records of trace_reader(files, buffsize, decoder), from the
+# record with id start_id on. If start_time or end_time are given, only event
+# records with a timestamp between them (inclusive), or without a timestamp,
+# are returned, as time_window.time_window would. Non-event records (meta
+# records and out of order warnings) are all passed through.
+def cached_trace_reader(files, buffsize, cache_dir, decoder='struct',
+    start_id=1, start_time=None, end_time=None):
+
+    # Without NumPy, there is nothing to memory-map the cache with
+    if numpy is None:
+        sys.stderr.write("NumPy is not installed; not using the trace" +
+            " cache\n")
+        stream = trace_reader.trace_reader(files, buffsize, decoder)
+        if start_time is not None or end_time is not None:
+            stream = time_window.time_window(stream, start_time or 0,
+                end_time, buffsize)
+        return _skip_ids(stream, start_id)
+
+    path = os.path.join(cache_dir, _get_cache_key(files, buffsize))
+    if not os.path.exists(path):
+        if start_id <= 1 and start_time is None and end_time is None:
+            return _write_cache(path, files, buffsize, decoder)
+        for record in _write_cache(path, files, buffsize, decoder):
+            pass
+    return _read_cache(path, files, buffsize, start_id, start_time, end_time)
+
+###############################################################################
+# Private functions
+###############################################################################
+
+# Return the name of the cache entry for the given trace files and buffer size
+def _get_cache_key(files, buffsize):
+    key = [CACHE_VERSION, buffsize]
+    for file in files:
+        stat = os.stat(file)
+        key.append((os.path.abspath(file), stat.st_size, stat.st_mtime))
+    return hashlib.sha1(repr(key)).hexdigest()
+
+# Generator reading records from trace files, writing them to a new cache
+# entry as they go by
+def _write_cache(path, files, buffsize, decoder):
+    tmp_path = "%s.tmp-%d" % (path, os.getpid())
+    os.makedirs(tmp_path)
+    records_path = os.path.join(tmp_path, 'records.bin')
+    records_file = open(records_path, 'wb')
+    complete = False
+    try:
+        out_of_order = []
+        for record in trace_reader.trace_reader(files, buffsize, decoder):
+            if record.record_type == "event":
+                # Pack the record before anything downstream modifies it
+                records_file.write(record.pack())
+            elif record.type_name == "out_of_order_warning":
+                out_of_order.append(record.id)
+            yield record
+        records_file.close()
+        _write_columns(tmp_path, records_path)
+        os.remove(records_path)
+        numpy.save(os.path.join(tmp_path, 'out_of_order.npy'),
+            numpy.array(out_of_order, dtype=numpy.int64))
+        complete = True
+    finally:
+        records_file.close()
+        if complete and not os.path.exists(path):
+            os.rename(tmp_path, path)
+        else:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+# Split a file of raw records, in merged order, into the columns of a cache
+# entry
+def _write_columns(path, records_path):
+    headers = trace_reader.read_headers(records_path)
+    types = numpy.array(headers['type'])
+    for key in ['type', 'cpu', 'pid', 'job']:
+        numpy.save(os.path.join(path, key + '.npy'), headers[key])
+    when = numpy.zeros(len(types), dtype=numpy.uint64)
+    rank = numpy.zeros(len(types), dtype=numpy.int64)
+    type_names = trace_reader.get_type_names()
+    for type_name, rows in trace_reader.read_columns(records_path).items():
+        type_num = type_names.index(type_name) + 1
+        positions = numpy.flatnonzero(types == type_num)
+        rank[positions] = numpy.arange(len(positions))
+        for key in trace_reader.get_keys(type_num):
+            if key == 'when':
+                when[positions] = rows[key]
+            elif key not in _HEADER_KEYS:
+                numpy.save(os.path.join(path, _get_column_name(type_name,
+                    key) + '.npy'), rows[key])
+    numpy.save(os.path.join(path, 'when.npy'), when)
+    numpy.save(os.path.join(path, 'rank.npy'), rank)
+
+# Generator reading records from an existing cache entry
+def _read_cache(path, files, buffsize, start_id, start_time, end_time):
+
+    # Yield the same meta records as trace_reader
+    class Obj: pass
+    record = Obj()
+    record.record_type = "meta"
+    record.type_name = "trace_files"
+    record.files = files
+    record.positions = None   # Positions in the trace files are not known
+    yield record
+
+    record = Obj()
+    record.record_type = "meta"
+    record.type_name = "num_cpus"
+    record.num_cpus = len(files)
+    yield record
+
+    columns = _Columns(path)
+    out_of_order = numpy.load(os.path.join(path, 'out_of_order.npy')).tolist()
+    out_of_order.reverse()
+
+    # Pick the rows to read, a block at a time, along with the last row a
+    # read of the trace files would have gone through by the end of the block
+    first = max(start_id - 1, 0)
+    count = len(columns.get('type'))
+    if start_time is None and end_time is None:
+        blocks = ((numpy.arange(start, min(start + CACHE_BLOCK_SIZE, count)),
+            min(start + CACHE_BLOCK_SIZE, count) - 1)
+            for start in xrange(first, count, CACHE_BLOCK_SIZE))
+    else:
+        blocks = _get_window_blocks(columns, first, start_time, end_time,
+            buffsize)
+
+    # Warn about every out of order record up to each record, and up to the
+    # last row gone through, as a read of the trace files would have
+    # (warnings are not filtered out by id or time)
+    def warning(id):
+        record = Obj()
+        record.record_type = "meta"
+        record.type_name = "out_of_order_warning"
+        record.id = id
+        return record
+
+    for rows, last in blocks:
+        ids = (rows + 1).tolist()
+        for id, record in zip(ids, _read_rows(columns, rows)):
+            while len(out_of_order) > 0 and out_of_order[-1] <= id:
+                yield warning(out_of_order.pop())
+            record.id = id
+            yield record
+        while len(out_of_order) > 0 and out_of_order[-1] <= last + 1:
+            yield warning(out_of_order.pop())
+
+# Generator over the rows from first on that are in a time window (with a
+# timestamp between start_time and end_time, either of which may be None, or
+# without a timestamp), as (rows, last) pairs, where rows is an array of at
+# most CACHE_BLOCK_SIZE rows and last is the last row gone through. Like
+# time_window.time_window, it stops once buffsize rows with a timestamp past
+# end_time have followed the first one, with no other row with a timestamp
+# in between. The rows before first count towards that too, as the earliest
+# filter comes after the time window.
+def _get_window_blocks(columns, first, start_time, end_time, buffsize):
+    count = len(columns.get('type'))
+    past = 0
+    if end_time is None:
+        first_block = first
+    else:
+        first_block = 0
+    for start in xrange(first_block, count, CACHE_BLOCK_SIZE):
+        stop = min(start + CACHE_BLOCK_SIZE, count)
+        when = columns.get('when')[start:stop]
+        timed = _get_timed(columns.get('type')[start:stop])
+        selected = ~timed
+        in_window = timed.copy()
+        if start_time is not None:
+            in_window &= when >= start_time
+        if end_time is not None:
+            after = when > end_time
+            in_window &= ~after
+        selected |= in_window
+        if start < first:
+            selected[:first - start] = False
+        if end_time is not None:
+            # Count the rows past end_time in a row, among the rows with a
+            # timestamp, carrying the count over from the previous block
+            rows = numpy.flatnonzero(timed)
+            indexes = numpy.arange(len(rows))
+            resets = numpy.maximum.accumulate(numpy.where(after[rows],
+                -1 - past, indexes))
+            ends = numpy.flatnonzero(indexes - resets > buffsize)
+            if len(ends) > 0:
+                end = rows[ends[0]]
+                yield start + numpy.flatnonzero(selected[:end]), start + end
+                return
+            if len(rows) > 0:
+                past = len(rows) - 1 - resets[-1]
+        yield start + numpy.flatnonzero(selected), stop - 1
+
+# Return, for an array of record types, whether the records have a timestamp
+def _get_timed(types):
+    timed = numpy.ones(len(types), dtype=bool)
+    for type_num in range(1, len(trace_reader.get_type_names()) + 1):
+        if not trace_reader.has_timestamp(type_num):
+            timed &= types != type_num
+    return timed
+
+# Return the records in the given rows of a cache entry, in order
+def _read_rows(columns, rows):
+    types = columns.get('type')[rows]
+    records = numpy.empty(len(rows), dtype=object)
+    for type_num in numpy.unique(types).tolist():
+        positions = numpy.flatnonzero(types == type_num)
+        type_rows = rows[positions]
+        ranks = None
+        values = []
+        for key in trace_reader.get_keys(type_num):
+            if key in _HEADER_KEYS or key == 'when':
+                values.append(columns.get(key)[type_rows])
+            else:
+                if ranks is None:
+                    ranks = columns.get('rank')[type_rows]
+                type_name = trace_reader.get_type_names()[type_num - 1]
+                values.append(columns.get(_get_column_name(type_name,
+                    key))[ranks])
+        records[positions] = trace_reader.build_records(type_num, values)
+    return records.tolist()
+
+# Return the name of the column holding a field of the records of a type
+def _get_column_name(type_name, key):
+    return "%s.%s" % (type_name, key.replace('?', ''))
+
+# Pass through the records of a stream, leaving out the event records with an
+# id before start_id
+def _skip_ids(stream, start_id):
+    for record in stream:
+        if record.record_type == "event" and record.id < start_id:
+            continue
+        yield record
+
+###############################################################################
+# Classes
+###############################################################################
+
+# The columns of a cache entry, each memory-mapped the first time it is used
+class _Columns(object):
+    def __init__(self, path):
+        self.path = path
+        self.columns = {}
+
+    def get(self, name):
+        if name not in self.columns:
+            self.columns[name] = numpy.load(os.path.join(self.path,
+                name + '.npy'), mmap_mode='r')
+        return self.columns[name]
+
+###############################################################################
+# Constants
+###############################################################################
+
+# Bump this whenever the layout of a cache entry changes
+CACHE_VERSION = 2
+
+# Number of rows of a cache entry turned back into records at once
+CACHE_BLOCK_SIZE = 4096
+
+# Fields that every record has, each kept in a column of its own
+_HEADER_KEYS = ['type', 'cpu', 'pid', 'job']
@@ -0,0 +1,149 @@
+###############################################################################
+# Description
+###############################################################################
+
+# Store event records and G-EDF / P-EDF error records in a SQLite database, and
+# query it afterwards without reading the trace again.
+#
+# The records go into one table, 'records', with the columns of the exporter
+# (see exporter.py), plus 'length': the length of an inversion, for
+# 'inversion_end' errors. Rows are inserted in batches of DB_BATCH_SIZE with
+# executemany, all in one transaction, and the indexes (on (pid, job), 'when',
+# 'cpu' and 'type_name') are built once at the end, which is much faster than
+# keeping them up to date while loading. Any 'records' table already in the
+# database is replaced.
+#
+# query() answers questions like "all deadline misses of pid X between t1 and
+# t2" or "the longest inversions on CPU 3" ('cpu' of an error is the partition
+# of its job, so only P-EDF errors have one).
+
+###############################################################################
+# Imports
+###############################################################################
+
+import atexit
+import sqlite3
+
+from unit_trace import exporter
+
+###############################################################################
+# Public functions
+###############################################################################
+
+COLUMNS = exporter.COLUMNS + ['length']
+
+DB_BATCH_SIZE = 10000
+
+# Store the records of a stream in a database file
+def trace_db(stream, file):
+    sink = TraceDatabase(file)
+    for record in stream:
+        sink.process(record)
+    sink.finish()
+
+# A sink for the dispatcher (see dispatcher.py), storing records in a database
+# file
+class TraceDatabase(object):
+
+    def __init__(self, file):
+        self.db = sqlite3.connect(file)
+        self.db.execute('PRAGMA synchronous = OFF')
+        self.db.execute('PRAGMA journal_mode = MEMORY')
+        self.db.execute('DROP TABLE IF EXISTS records')
+        self.db.execute('CREATE TABLE records (%s)' % (', '.join(
+            ['"%s" %s' % (name, type) for name, type in _COLUMN_TYPES])))
+        self.insert = 'INSERT INTO records VALUES (%s)' % (
+            ', '.join(['?'] * len(COLUMNS)))
+        self.rows = []
+        self.finished = False
+        atexit.register(self.finish)
+
+    def process(self, record):
+        row = exporter.get_row(record)
+        if row is None:
+            return
+        if record.type_name == 'inversion_end':
+            row.append(record.job.inversion_end - record.job.inversion_start)
+        else:
+            row.append(None)
+        self.rows.append(row)
+        if len(self.rows) == DB_BATCH_SIZE:
+            self._write_batch()
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self._write_batch()
+        for name, columns in _INDEXES:
+            self.db.execute('CREATE INDEX %s ON records (%s)' % (name,
+                ', '.join(['"%s"' % (column) for column in columns])))
+        self.db.commit()
+        self.db.close()
+
+    def _write_batch(self):
+        if len(self.rows) > 0:
+            self.db.executemany(self.insert, self.rows)
+            self.rows = []
+
+# Return the records in a database file matching all the given conditions, as
+# dicts mapping column names to values (None where a column does not apply).
+# start_time and end_time bound 'when', inclusively. Records are in order of
+# 'when', or if longest is given, they are the longest inversions (the
+# 'inversion_end' errors, unless type_name says otherwise), longest first, at
+# most longest of them.
+def query(file, type_name=None, pid=None, job=None, cpu=None,
+    start_time=None, end_time=None, longest=None):
+    if longest is not None and type_name is None:
+        type_name = 'inversion_end'
+    conditions = []
+    values = []
+    for column, value in [('type_name', type_name), ('pid', pid),
+        ('job', job), ('cpu', cpu)]:
+        if value is not None:
+            conditions.append('"%s" = ?' % (column))
+            values.append(value)
+    if start_time is not None:
+        conditions.append('"when" >= ?')
+        values.append(start_time)
+    if end_time is not None:
+        conditions.append('"when" <= ?')
+        values.append(end_time)
+    sql = 'SELECT * FROM records'
+    if len(conditions) > 0:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    if longest is not None:
+        sql += ' ORDER BY length DESC, "when" LIMIT ?'
+        values.append(longest)
+    else:
+        sql += ' ORDER BY "when", record_type DESC, id'
+    db = sqlite3.connect(file)
+    try:
+        for row in db.execute(sql, values):
+            yield dict(zip(COLUMNS, row))
+    finally:
+        db.close()
+
+# Print the output of query(), one 'Column: value' line per column that applies,
+# with a blank line after each record
+def print_query(rows):
+    for row in rows:
+        for column in COLUMNS:
+            if row[column] is not None:
+                print "%s: %s" % (column, row[column])
+        print ""
+
+###############################################################################
+# Private functions
+###############################################################################
+
+# SQL types of the columns
+_COLUMN_TYPES = [(name, 'INTEGER') for name in COLUMNS]
+_COLUMN_TYPES[0] = ('record_type', 'TEXT')
+_COLUMN_TYPES[1] = ('type_name', 'TEXT')
+
+# Names and columns of the indexes
+_INDEXES = [('records_pid_job', ['pid', 'job']),
+    ('records_when', ['when']),
+    ('records_cpu', ['cpu']),
+    ('records_type_name', ['type_name'])]
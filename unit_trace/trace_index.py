@@ -0,0 +1,191 @@
+###############################################################################
+# Description
+###############################################################################
+
+# A seekable index over a set of trace files, so that reading can start at a
+# given record id without decoding and merging every record before it.
+#
+# The index holds a checkpoint of the merge in trace_reader every
+# INDEX_INTERVAL records: the id and timestamp of the last record before the
+# checkpoint, and for every trace file the byte offset of the next record to
+# read and the offsets of the records still in its reorder window. Resuming
+# the merge from a checkpoint yields records with the same ids as a full read.
+# It also holds the ids of all out of order records, so that skipped records
+# still produce their out_of_order_warning, and the id, file and offset of all
+# records without a timestamp (such as name and params records), so that
+# reading from a checkpoint found by time still produces them.
+#
+# The index is built with one full pass over the trace files the first time it
+# is needed, and stored next to the first trace file (with an '.idx'
+# extension). It is rebuilt whenever the paths, sizes or modification times of
+# the trace files or the buffer size change.
+
+###############################################################################
+# Imports
+###############################################################################
+
+import bisect
+import cPickle
+import os
+import sys
+
+from unit_trace import trace_reader
+
+###############################################################################
+# Public functions
+###############################################################################
+
+# Generator function returning the records of trace_reader(files, buffsize),
+# starting at the record with the given id. Non-event records (meta records
+# and out of order warnings) are all passed through.
+def indexed_trace_reader(files, buffsize, start_id, decoder='struct'):
+    index = get_index(files, buffsize, decoder)
+    checkpoint = index.find_by_id(start_id)
+    stream = trace_reader.trace_reader(files, buffsize, decoder, checkpoint)
+    for record in stream:
+        if record.record_type == "event" and record.id < start_id:
+            continue
+        yield record
+
+# Return the index for the given trace files, loading it from disk if it is up
+# to date, or building (and storing) it otherwise
+def get_index(files, buffsize, decoder='struct'):
+    path = files[0] + '.idx'
+    key = _get_index_key(files, buffsize)
+    try:
+        f = open(path, 'rb')
+        index = cPickle.load(f)
+        f.close()
+        if index.key == key:
+            return index
+    except (IOError, EOFError, cPickle.UnpicklingError, AttributeError):
+        pass
+    index = _build_index(files, buffsize, decoder)
+    index.key = key
+    try:
+        f = open(path, 'wb')
+        cPickle.dump(index, f, cPickle.HIGHEST_PROTOCOL)
+        f.close()
+    except IOError:
+        sys.stderr.write("Could not write trace index %s\n" % (path))
+    return index
+
+###############################################################################
+# Classes
+###############################################################################
+
+# A checkpoint of the merge, in the form trace_reader resumes from
+class Checkpoint(object):
+    def __init__(self, id, last_time, files):
+        self.id = id
+        self.last_time = last_time
+        self.files = files
+        self.out_of_order = []
+        self.untimed = []
+
+class TraceIndex(object):
+    def __init__(self, checkpoints, out_of_order, untimed):
+        self.key = None
+        self.checkpoints = checkpoints
+        self.out_of_order = out_of_order
+        self.untimed = untimed
+
+    # Return the last checkpoint before the record with the given id, or None
+    # if reading has to start from the beginning
+    def find_by_id(self, id):
+        ids = [checkpoint.id for checkpoint in self.checkpoints]
+        return self._get(bisect.bisect_left(ids, id) - 1)
+
+    # Return the last checkpoint before any record with a timestamp of at
+    # least when, or None if reading has to start from the beginning
+    def find_by_time(self, when):
+        times = [checkpoint.last_time for checkpoint in self.checkpoints]
+        return self._get(bisect.bisect_left(times, when) - 1)
+
+    # Return checkpoint i, with the out of order ids and the records without a
+    # timestamp up to it filled in
+    def _get(self, i):
+        if i < 0:
+            return None
+        checkpoint = self.checkpoints[i]
+        end = bisect.bisect_right(self.out_of_order, checkpoint.id)
+        checkpoint.out_of_order = self.out_of_order[:end]
+        ids = [untimed[0] for untimed in self.untimed]
+        end = bisect.bisect_right(ids, checkpoint.id)
+        checkpoint.untimed = self.untimed[:end]
+        return checkpoint
+
+###############################################################################
+# Private functions
+###############################################################################
+
+# Return what an index must have been built from to be valid for the given
+# trace files and buffer size
+def _get_index_key(files, buffsize):
+    key = [INDEX_VERSION, INDEX_INTERVAL, buffsize]
+    for file in files:
+        stat = os.stat(file)
+        key.append((os.path.abspath(file), stat.st_size, stat.st_mtime))
+    return key
+
+# Build an index with a full pass over the trace files
+def _build_index(files, buffsize, decoder):
+
+    # Offsets of the records in each reorder window, and the offset of the next
+    # record to be read from each file
+    pending = [set() for file in files]
+    next_offsets = [0 for file in files]
+
+    # Keep track of every record the merge reads from a file
+    def observe(x, file_iter):
+        for offset, record in file_iter:
+            pending[x].add(offset)
+            next_offsets[x] = offset + trace_reader.RECORD_HEAD_SIZE
+            yield offset, record
+
+    file_iters = [observe(x, trace_reader.get_file_iter(file, decoder))
+        for x, file in enumerate(files)]
+
+    # Follow the merge, numbering records and tracking last_time exactly like
+    # trace_reader does
+    checkpoints = []
+    out_of_order = []
+    untimed = []
+    last_time = None
+    id = 0
+    for x, offset, record in trace_reader.merge_records(file_iters, buffsize):
+        pending[x].discard(offset)
+        id += 1
+        if not trace_reader.has_timestamp(record.type_num):
+            untimed.append((id, x, offset))
+        if last_time is not None and record.when < last_time:
+            out_of_order.append(id)
+        else:
+            last_time = record.when
+        if id % INDEX_INTERVAL == 0:
+            states = [(next_offsets[y], _get_runs(pending[y]))
+                for y in range(len(files))]
+            checkpoints.append(Checkpoint(id, last_time, states))
+    return TraceIndex(checkpoints, out_of_order, untimed)
+
+# Return a set of record offsets as a list of (offset, count) runs of
+# consecutive records
+def _get_runs(offsets):
+    size = trace_reader.RECORD_HEAD_SIZE
+    runs = []
+    for offset in sorted(offsets):
+        if len(runs) > 0 and runs[-1][0] + runs[-1][1] * size == offset:
+            runs[-1][1] += 1
+        else:
+            runs.append([offset, 1])
+    return [tuple(run) for run in runs]
+
+###############################################################################
+# Constants
+###############################################################################
+
+# Number of records between checkpoints
+INDEX_INTERVAL = 16384
+
+# Bump this whenever the layout of the index changes
+INDEX_VERSION = 2
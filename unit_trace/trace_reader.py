@@ -5,8 +5,9 @@
 # trace_reader(files) returns an iterator which produces records
 # in order from the files given. (the param is a list of files.)
 #
-# Each record is just a Python object. It is guaranteed to have the following
-# attributes:
+# Each record is an instance of one of the record classes at the bottom of
+# this file (one per record type, using __slots__ to keep records small). It
+# is guaranteed to have the following attributes:
 #   - 'pid': pid of the task
 #   - 'job': job number for that task
 #   - 'cpu', given by LITMUS
@@ -20,29 +21,90 @@
 #
 # To find out exactly what attributes are set for each record type, look at
 #     the trace-parsing information at the bottom of this file.
+#
+# Four decoders are available. The default 'struct' decoder reads and unpacks
+# one record at a time. The 'numpy' decoder reads blocks of NUMPY_BLOCK_SIZE
+# records and parses them with one NumPy structured dtype per record type, and
+# then builds the records of each type straight from the resulting columns.
+# Decoding this way takes about 40% less time than with the struct decoder,
+# but merging the files and everything downstream cost the same, so a whole
+# run is only somewhat faster. The 'mmap' decoder memory-maps each trace file
+# and only unpacks the fields of a record the first time one of them is
+# accessed, so records that are filtered out by id are never decoded. The
+# 'parallel' decoder does what the 'numpy' decoder does, but decodes chunks of
+# every trace file into NumPy columns in a pool of worker processes, which
+# send the columns back as arrays. The main process only builds the records
+# from them, merges them and assigns ids. All of them produce records with the
+# same attributes. read_columns(file) exposes
+# the NumPy columns directly, for callers that never need per-record objects.
 
 ###############################################################################
 # Imports
 ###############################################################################
 
+import collections
+import heapq
+import itertools
+import mmap
+import multiprocessing
+import os
+import re
 import struct
 import sys
 
+# NumPy is only needed by the bulk decoder
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 ###############################################################################
 # Public functions
 ###############################################################################
 
 # Generator function returning an iterable over records in a trace file.
-def trace_reader(files, buffsize):
-
-    # Yield a record containing the input files
+# The decoder is 'struct', 'numpy', 'mmap' or 'parallel' (see the description
+# above).
+#
+# If a checkpoint of the merge is given (see trace_index.py), reading resumes
+# right after the record the checkpoint was taken at, and records get the same
+# ids as when reading from the start. The checkpoint has the attributes:
+#   - 'id': the id of the last record before the checkpoint
+#   - 'last_time': the value of last_time (see below) at the checkpoint
+#   - 'out_of_order': the ids of out of order records up to the checkpoint.
+#       Warnings are yielded for them first.
+#   - 'untimed': (id, x, offset) tuples giving the records without a
+#       timestamp (such as name and params records) up to the checkpoint, by
+#       id, position of their file in files and byte offset. They are yielded
+#       first too, along with the warnings, in order of id, so that filters by
+#       time do not lose them.
+#   - 'files': for each file, a (next_offset, runs) tuple. next_offset is the
+#       byte offset of the next record that was yet to be read. runs is a list
+#       of (offset, count) pairs, each giving a run of count consecutive
+#       records, starting at offset, that were still in the reorder window of
+#       the file.
+def trace_reader(files, buffsize, decoder='struct', checkpoint=None):
+
+    # Fall back to the struct decoder if NumPy is not available
+    if decoder in ['numpy', 'parallel'] and numpy is None:
+        sys.stderr.write("NumPy is not installed; falling back to the" +
+            " struct decoder\n")
+        decoder = 'struct'
+
+    # Yield a record containing the input files, and the byte position
+    # reached in each of them, which is kept up to date as records are read.
     # This is used by progress.py to calculate progress
+    if checkpoint is None:
+        positions = [0] * len(files)
+    else:
+        positions = [state[0] for state in checkpoint.files]
     class Obj: pass
     record = Obj()
     record.record_type = "meta"
     record.type_name = "trace_files"
     record.files = files
+    record.positions = positions
     yield record
 
     # Yield a record indicating the number of CPUs, used by the G-EDF test
@@ -52,35 +114,6 @@ def trace_reader(files, buffsize):
     record.num_cpus = len(files)
     yield record
 
-    # Create iterators for each file and a buffer to store records in
-    file_iters = [] # file iterators
-    file_iter_buff = [] # file iterator buffers
-    for file in files:
-        file_iter = _get_file_iter(file)
-        file_iters.append(file_iter)
-        try:
-            file_iter_buff.append([file_iter.next()])
-        # What if there isn't a single valid record in a trace file?
-        # file_iter.next() will raise a StopIteration that we need to catch
-        except:
-            # Forget that file iter
-            file_iters.pop()
-
-    # We keep some number of records (given as buffsize) in each buffer and
-    # then keep the buffer sorted.  This is because records may have been
-    # recorded slightly out of order.  The 'try' and 'except' catches the case
-    # where there are less than buffsize records in a file (throwing a
-    # StopIteration) which otherwise would propogate up and cause the
-    # trace_reader generator itself to throw a StopIteration.
-    for x in range(0,len(file_iter_buff)):
-        try:
-            for y in range(0,buffsize):
-                file_iter_buff[x].append(file_iters[x].next())
-        except StopIteration:
-            pass
-    for x in range(0,len(file_iter_buff)):
-        file_iter_buff[x] = sorted(file_iter_buff[x],key=lambda rec: rec.when)
-
     # Remember the time of the last record. This way, we can make sure records
     # truly are produced in monotonically increasing order by time and terminate
     # fatally if they are not.
@@ -89,32 +122,32 @@ def trace_reader(files, buffsize):
     # We want to give records ID numbers so users can filter by ID
     id = 0
 
-    # Keep pulling records as long as we have a buffer
-    while len(file_iter_buff) > 0:
-        # Select the earliest record from those at the heads of the buffers
-        earliest = -1
-        buff_to_refill = -1
-        for x in range(0,len(file_iter_buff)):
-            if earliest==-1 or file_iter_buff[x][0].when < earliest.when:
-                earliest = file_iter_buff[x][0]
-                buff_to_refill = x
-
-        # Take it out of the buffer
-        del file_iter_buff[buff_to_refill][0]
-
-        # Try to append a new record to the buffer (if there is another) and
-        #     then keep the buffer sorted
-        try:
-            file_iter_buff[buff_to_refill].append(file_iters[buff_to_refill].next())
-            file_iter_buff[buff_to_refill] = sorted(file_iter_buff[buff_to_refill],
-                key=lambda rec: rec.when)
-
-        # If there aren't any more records, fine. Unless the buffer is also empty.
-        # If that is the case, delete the buffer.
-        except StopIteration:
-            if len(file_iter_buff[buff_to_refill]) < 1:
-                del file_iter_buff[buff_to_refill]
-                del file_iters[buff_to_refill]
+    # Create iterators for each file
+    if checkpoint is None:
+        file_iters = [get_file_iter(file, decoder) for file in files]
+    else:
+        file_iters = [_get_resumed_file_iter(file, decoder, state)
+            for file, state in zip(files, checkpoint.files)]
+        last_time = checkpoint.last_time
+        id = checkpoint.id
+        skipped = []
+        for out_of_order_id in checkpoint.out_of_order:
+            record = Obj()
+            record.record_type = "meta"
+            record.type_name = "out_of_order_warning"
+            record.id = out_of_order_id
+            skipped.append((record.id, 0, record))
+        for untimed_id, x, offset in checkpoint.untimed:
+            for offset, record in _read_runs(files[x], [(offset, 1)]):
+                record.id = untimed_id
+                skipped.append((record.id, 1, record))
+        skipped.sort(key=lambda entry: entry[:2])
+        for entry in skipped:
+            yield entry[2]
+
+    # Pull records from all files in order of time
+    for x, offset, earliest in merge_records(file_iters, buffsize):
+        positions[x] = offset + RECORD_HEAD_SIZE
 
         # Give the record an id number
         id += 1
@@ -133,15 +166,160 @@ def trace_reader(files, buffsize):
         # Yield the record
         yield earliest
 
+# Returns an iterator over the records of several file iterators (as returned
+# by get_file_iter), in order of time. It produces (x, offset, record) tuples,
+# where x is the position of the record's file iterator in file_iters and
+# offset is the byte offset of the record in its file.
+#
+# Records may have been recorded slightly out of order, so we keep a reorder
+# window of buffsize + 1 records from each file. Each window is a heap of
+# (when, offset, record) entries, so records with equal timestamps come out in
+# file order. A second heap holds a (when, x) entry for the head of every
+# window x, so picking the earliest record costs O(log n) in the number of
+# files, and ties between files go to the one given first.
+def merge_records(file_iters, buffsize):
+    windows = {}
+    for x, file_iter in enumerate(file_iters):
+        window = []
+        for offset, record in itertools.islice(file_iter, buffsize + 1):
+            window.append((record.when, offset, record))
+        # What if there isn't a single valid record in a trace file?
+        # Then we simply forget that file iter.
+        if len(window) > 0:
+            heapq.heapify(window)
+            windows[x] = window
+    heads = [(window[0][0], x) for x, window in windows.items()]
+    heapq.heapify(heads)
+
+    # Keep pulling records as long as we have a window
+    while len(heads) > 0:
+        x = heads[0][1]
+        window = windows[x]
+
+        # Take the earliest record out of its window, and refill the window
+        # with the next record from the same file (if there is another)
+        try:
+            offset, record = file_iters[x].next()
+        except StopIteration:
+            when, offset, earliest = heapq.heappop(window)
+        else:
+            when, offset, earliest = heapq.heapreplace(window,
+                (record.when, offset, record))
+
+        # Update the head of the window. If the window is empty, the file has
+        # been exhausted.
+        if len(window) > 0:
+            heapq.heapreplace(heads, (window[0][0], x))
+        else:
+            heapq.heappop(heads)
+
+        yield x, offset, earliest
+
+# Returns an iterator to pull (offset, record) pairs from a file, starting at
+# the given byte offset, where offset is the byte offset of the record
+def get_file_iter(file, decoder='struct', start=0):
+    if decoder == 'numpy':
+        return _get_file_iter_numpy(file, start)
+    elif decoder == 'mmap':
+        return _get_file_iter_mmap(file, start)
+    elif decoder == 'parallel':
+        return _get_file_iter_parallel(file, start)
+    else:
+        return _get_file_iter(file, start)
+
+# Returns the records of a trace file as NumPy columns, without building
+# per-record objects. The result maps each type_name to a NumPy structured
+# array holding every record of that type, in file order. Fields are named
+# after the keys of the matching St*Data class, e.g.
+# read_columns(file)['release']['deadline'].
+def read_columns(file):
+    if numpy is None:
+        raise ImportError("read_columns requires NumPy")
+    size = os.path.getsize(file)
+    count = size // RECORD_HEAD_SIZE
+    if count * RECORD_HEAD_SIZE != size:
+        sys.stderr.write("Skipping record that does not match proper" +
+            " struct formatting\n")
+    columns = {}
+    if count == 0:
+        return columns
+    data = numpy.memmap(file, dtype=numpy.uint8, mode='r',
+        shape=(count * RECORD_HEAD_SIZE,))
+    types = data.view(_get_numpy_dtype(StHeader))['type']
+    for type_num in numpy.unique(types).tolist():
+        try:
+            type = _get_type(type_num)
+        except:
+            continue
+        rows = data.view(_get_numpy_dtype(type))[types == type_num]
+        columns[_get_type_name(type_num)] = rows
+    return columns
+
+# Returns the headers of the records of a trace file as a NumPy structured
+# array, in file order, with the fields 'type', 'cpu', 'pid' and 'job'
+def read_headers(file):
+    if numpy is None:
+        raise ImportError("read_headers requires NumPy")
+    count = os.path.getsize(file) // RECORD_HEAD_SIZE
+    if count == 0:
+        return numpy.zeros(0, dtype=_get_numpy_dtype(StHeader))
+    return numpy.memmap(file, dtype=_get_numpy_dtype(StHeader), mode='r',
+        shape=(count,))
+
+# Build the records of one type from NumPy columns, given in the order of the
+# keys of the type (e.g. those of read_columns). Returns a list of records.
+# The records are made by map() straight from the columns, without building a
+# tuple or dict per record first.
+def build_records(type_num, columns):
+    values = []
+    for column in columns:
+        if column.dtype.kind == 'S':
+            # NumPy strips trailing NUL bytes; struct does not
+            size = column.dtype.itemsize
+            if size == 1:
+                values.append(map(_chars.__getitem__,
+                    column.view(numpy.uint8).tolist()))
+            else:
+                values.append([value.ljust(size, '\0')
+                    for value in column.tolist()])
+        elif column.dtype.kind == 'u' and (column.dtype.itemsize < 8 or
+                len(column) == 0 or column.max() < 1 << 63):
+            # Unsigned columns would become longs; struct gives ints
+            values.append(column.astype(numpy.int64).tolist())
+        else:
+            values.append(column.tolist())
+    return map(_record_classes[type_num], *values)
+
+# Return the (key, value) pairs of the fields decoded from an event record,
+# in the order of its binary format
+def get_fields(record):
+    return [(key, getattr(record, key)) for key in get_keys(record.type_num)]
+
+# Return the keys of the fields of a type of event record, given its type_num,
+# in the order of its binary format (and of the arguments of its record class)
+def get_keys(type_num):
+    return _get_type(type_num).keys
+
+# Return whether a type of event record has a timestamp, given its type_num
+def has_timestamp(type_num):
+    return 'when' in _get_type(type_num).keys
+
+# Return the type_name of each type of event record, in order of type number
+def get_type_names():
+    return [record_class.type_name for record_class in _record_classes[1:]]
+
 ###############################################################################
 # Private functions
 ###############################################################################
 
 # Returns an iterator to pull records from a file
-def _get_file_iter(file):
+def _get_file_iter(file, start=0):
     f = open(file,'rb')
+    f.seek(start)
+    offset = start
     while True:
         data = f.read(RECORD_HEAD_SIZE)
+        offset += len(data)
         try:
             type_num = struct.unpack_from('b',data)[0]
         except struct.error:
@@ -153,43 +331,209 @@ def _get_file_iter(file):
                 (type_num))
             continue
         try:
-            values = struct.unpack_from(StHeader.format +
-                type.format,data)
-            record_dict = dict(zip(type.keys,values))
-	    if(type_num == 2):
-		record_dict["partition"] = ord(record_dict["partition"])
+            values = type.formatStr.unpack_from(data)
         except struct.error:
-            f.close()
             sys.stderr.write("Skipping record that does not match proper" +
                 " struct formatting\n")
-            continue
-
-        # Convert the record_dict into an object
-        record = _dict2obj(record_dict)
-
-        # Give it a type name (easier to work with than type number)
-        record.type_name = _get_type_name(type_num)
-
-        # All records should have a 'record type' field.
-        # e.g. these are 'event's as opposed to 'error's
-        record.record_type = "event"
+            break
+        yield offset - len(data), _record_classes[type_num](*values)
+    f.close()
+
+# Returns an iterator to pull records from a file, decoding large blocks of
+# records at once with NumPy. The records of a block are built in bulk (see
+# _decode_block), and handed out by a chain of izip iterators, so pulling the
+# next record does not go through any Python code.
+def _get_file_iter_numpy(file, start=0):
+    return itertools.chain.from_iterable(_get_blocks_numpy(file, start))
+
+# Generator over the blocks of a file, as iterators of (offset, record) pairs
+def _get_blocks_numpy(file, start):
+    f = open(file,'rb')
+    f.seek(start)
+    offset = start
+    while True:
+        data = f.read(RECORD_HEAD_SIZE * NUMPY_BLOCK_SIZE)
+        if len(data) == 0:
+            break
+        usable = len(data) - len(data) % RECORD_HEAD_SIZE
+        positions, records = _decode_block(data[:usable])
+        offsets = (positions * RECORD_HEAD_SIZE + offset).tolist()
+        yield itertools.izip(offsets, records)
+        offset += usable
+        if usable < len(data):
+            sys.stderr.write("Skipping record that does not match proper" +
+                " struct formatting\n")
+            break
+    f.close()
+
+# Returns an iterator to pull records from a file like _get_file_iter_numpy,
+# but with the blocks of the file decoded into columns by the worker processes
+# (see _decode_chunk), PARALLEL_CHUNK_SIZE records at a time. Up to
+# PARALLEL_PREFETCH chunks of each file are being decoded ahead of the one
+# being read, so every file keeps a worker busy.
+def _get_file_iter_parallel(file, start=0):
+    return itertools.chain.from_iterable(_get_blocks_parallel(file, start))
+
+# Generator over the chunks of a file, as iterators of (offset, record) pairs
+def _get_blocks_parallel(file, start):
+    pool = _get_pool()
+    size = RECORD_HEAD_SIZE * PARALLEL_CHUNK_SIZE
+    chunks = iter(xrange(start, os.path.getsize(file), size))
+    pending = collections.deque()
+    for offset in itertools.islice(chunks, PARALLEL_PREFETCH):
+        pending.append((offset, pool.apply_async(_decode_chunk,
+            (file, offset, size))))
+    while len(pending) > 0:
+        offset, result = pending.popleft()
+        for next_offset in itertools.islice(chunks, 1):
+            pending.append((next_offset, pool.apply_async(_decode_chunk,
+                (file, next_offset, size))))
+        count, columns, complete = result.get()
+        positions, records = _build_block(count, columns)
+        offsets = (positions * RECORD_HEAD_SIZE + offset).tolist()
+        yield itertools.izip(offsets, records)
+        if not complete:
+            sys.stderr.write("Skipping record that does not match proper" +
+                " struct formatting\n")
+            break
 
-        # If there is no timestamp, set the time to 0
-        if 'when' not in record.__dict__.keys():
+# Decode a chunk of a trace file into columns, in a worker process. Returns
+# the number of whole records in the chunk and their columns (see
+# _decode_columns), and whether the chunk ended on a whole record.
+def _decode_chunk(file, offset, size):
+    f = open(file,'rb')
+    f.seek(offset)
+    data = f.read(size)
+    f.close()
+    usable = len(data) - len(data) % RECORD_HEAD_SIZE
+    count, columns = _decode_columns(data[:usable])
+    return count, columns, usable == len(data)
+
+# Return the pool of worker processes used by the parallel decoder, starting
+# it the first time (with one worker per processor)
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = multiprocessing.Pool()
+    return _pool
+_pool = None
+
+# Returns an iterator to pull records from a memory-mapped file. Only the type
+# and timestamp of each record are decoded up front; the rest is decoded from
+# the mapping when it is first accessed (see _LazyRecord).
+def _get_file_iter_mmap(file, start=0):
+    f = open(file,'rb')
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        f.close()
+        return
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    f.close()
+    for offset in xrange(start, size - size % RECORD_HEAD_SIZE,
+            RECORD_HEAD_SIZE):
+        type_num = _type_num_struct.unpack_from(data, offset)[0]
+        try:
+            type = _get_type(type_num)
+        except:
+            sys.stderr.write("Skipping record with invalid type num: %d\n" %
+                (type_num))
+            continue
+        lazy_class = _lazy_record_classes[type_num]
+        record = lazy_class.__new__(lazy_class)
+        record._data = data
+        record._offset = offset
+        if 'when' in type.keys:
+            record.when = _when_struct.unpack_from(data,
+                offset + WHEN_OFFSET)[0]
+        else:
             record.when = 0
-	#for k in record.__dict__.keys():
-	#    print(k)
-	#    print(record.__dict__[k])
-	#print("--------------------------")
-        yield record
-
-# Convert a dict into an object
-def _dict2obj(d):
-    class Obj(object): pass
-    o = Obj()
-    for key in d.keys():
-        o.__dict__[key] = d[key]
-    return o
+        yield offset, record
+    if size % RECORD_HEAD_SIZE != 0:
+        sys.stderr.write("Skipping record that does not match proper" +
+            " struct formatting\n")
+
+# Returns an iterator that resumes reading a file from a checkpoint (see
+# trace_reader): first the records that were still in the reorder window of
+# the file, then every record from next_offset on
+def _get_resumed_file_iter(file, decoder, state):
+    next_offset, runs = state
+    for pair in _read_runs(file, runs):
+        yield pair
+    for pair in get_file_iter(file, decoder, next_offset):
+        yield pair
+
+# Generator over the (offset, record) pairs of runs of consecutive records of
+# a trace file, given as (offset, count) pairs
+def _read_runs(file, runs):
+    f = open(file,'rb')
+    for start, count in runs:
+        f.seek(start)
+        data = f.read(count * RECORD_HEAD_SIZE)
+        for pos in xrange(0, len(data), RECORD_HEAD_SIZE):
+            type_num = struct.unpack_from('b',data,pos)[0]
+            values = _get_type(type_num).formatStr.unpack_from(data,pos)
+            yield start + pos, _record_classes[type_num](*values)
+    f.close()
+
+# Mixed into a record class to make records backed by a memory-mapped trace
+# file. Such a record only keeps its position in the mapping until a field
+# that has not been decoded yet is accessed, at which point all of its fields
+# are unpacked at once by the __init__ of the record class.
+class _LazyRecord(object):
+    __slots__ = []
+    def __getattr__(self, name):
+        data = self._data
+        if data is None:
+            raise AttributeError(name)
+        self._data = None
+        values = _get_type(self.type_num).formatStr.unpack_from(data,
+            self._offset)
+        super(_LazyRecord, self).__init__(*values)
+        return getattr(self, name)
+
+# Decode a block of whole records with NumPy. Returns the positions of the
+# valid records in the block (their indexes, as a NumPy array) and the list of
+# those records, in the order they appear in the block.
+def _decode_block(data):
+    count, columns = _decode_columns(data)
+    return _build_block(count, columns)
+
+# Decode a block of whole records into NumPy columns. Returns the number of
+# records in the block, and a (type_num, positions, rows) tuple for each
+# type_num in it: the positions of the records of that type in the block (as
+# a NumPy array), and their fields as a NumPy structured array, or None if the
+# type_num is invalid.
+def _decode_columns(data):
+    types = numpy.frombuffer(data, dtype=_get_numpy_dtype(StHeader))['type']
+    columns = []
+    for type_num in numpy.unique(types).tolist():
+        positions = numpy.flatnonzero(types == type_num)
+        try:
+            type = _get_type(type_num)
+        except:
+            columns.append((type_num, positions, None))
+            continue
+        rows = numpy.frombuffer(data, dtype=_get_numpy_dtype(type))[positions]
+        columns.append((type_num, positions, rows))
+    return len(types), columns
+
+# Build the records of a block from its columns (see _decode_columns). Returns
+# the positions of the valid records and the list of those records, like
+# _decode_block.
+def _build_block(count, columns):
+    records = numpy.empty(count, dtype=object)
+    valid = numpy.ones(count, dtype=bool)
+    for type_num, positions, rows in columns:
+        if rows is None:
+            valid[positions] = False
+            for pos in positions.tolist():
+                sys.stderr.write("Skipping record with invalid type num:" +
+                    " %d\n" % (type_num))
+            continue
+        records[positions] = build_records(type_num,
+            [rows[key] for key in get_keys(type_num)])
+    positions = numpy.flatnonzero(valid)
+    return positions, records[positions].tolist()
 
 ###############################################################################
 # Trace record data types and accessor functions
@@ -203,6 +547,24 @@ def _dict2obj(d):
 
 RECORD_HEAD_SIZE = 24
 
+# Number of records decoded at once by the NumPy decoder. Larger blocks are
+# slower, as each block's records are all created at once and the garbage
+# collector has to go over them repeatedly.
+NUMPY_BLOCK_SIZE = 4096
+
+# Number of records decoded at once by a worker of the parallel decoder (kept
+# small for the same reason as NUMPY_BLOCK_SIZE, as the main process builds
+# the records of a chunk all at once), and number of chunks of each file
+# decoded ahead of the one being read
+PARALLEL_CHUNK_SIZE = 4096
+PARALLEL_PREFETCH = 2
+
+# Offset of the timestamp in the records that have one
+WHEN_OFFSET = 8
+
+_type_num_struct = struct.Struct('<b')
+_when_struct = struct.Struct('<Q')
+
 class StHeader:
     format =  '<bbhi'
     formatStr = struct.Struct(format)
@@ -292,3 +654,176 @@ def _get_type_name(type_num):
     type_names = [None,"name","params","release","assign","switch_to",
         "switch_away","completion","block","resume","action","sys_release"]
     return type_names[type_num]
+
+###############################################################################
+# Record classes
+###############################################################################
+
+# Each class below holds the decoded fields of one type of event record. The
+# classes use __slots__, so records carry no per-instance dict and attribute
+# access is fast. Constructor arguments are in the order of the keys of the
+# matching St*Data class, i.e. in the order struct.unpack_from returns them.
+# Records without a timestamp get a 'when' of 0.
+
+class EventRecord(object):
+    __slots__ = ['type','cpu','pid','job','when','id']
+    record_type = "event"
+
+    # Return the record in the binary sched_trace format it was decoded from
+    def pack(self):
+        type = _get_type(self.type_num)
+        values = [getattr(self, key) for key in type.keys]
+        if self.type_num == 2:
+            values[-1] = chr(values[-1])
+        return type.formatStr.pack(*values).ljust(RECORD_HEAD_SIZE, '\0')
+
+class NameRecord(EventRecord):
+    __slots__ = ['name']
+    type_name = "name"
+    type_num = 1
+    def __init__(self, type, cpu, pid, job, name):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = 0
+        self.name = name
+
+class ParamsRecord(EventRecord):
+    __slots__ = ['wcet','period','phase','partition']
+    type_name = "params"
+    type_num = 2
+    def __init__(self, type, cpu, pid, job, wcet, period, phase, partition):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = 0
+        self.wcet = wcet
+        self.period = period
+        self.phase = phase
+        self.partition = ord(partition)
+
+class ReleaseRecord(EventRecord):
+    __slots__ = ['deadline']
+    type_name = "release"
+    type_num = 3
+    def __init__(self, type, cpu, pid, job, when, deadline):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = when
+        self.deadline = deadline
+
+class AssignRecord(EventRecord):
+    __slots__ = ['target']
+    type_name = "assign"
+    type_num = 4
+    def __init__(self, type, cpu, pid, job, when, target):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = when
+        self.target = target
+
+class SwitchToRecord(EventRecord):
+    __slots__ = ['exec_time']
+    type_name = "switch_to"
+    type_num = 5
+    def __init__(self, type, cpu, pid, job, when, exec_time):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = when
+        self.exec_time = exec_time
+
+class SwitchAwayRecord(EventRecord):
+    __slots__ = ['exec_time']
+    type_name = "switch_away"
+    type_num = 6
+    def __init__(self, type, cpu, pid, job, when, exec_time):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = when
+        self.exec_time = exec_time
+
+class CompletionRecord(EventRecord):
+    __slots__ = ['forced','flags']
+    type_name = "completion"
+    type_num = 7
+    def __init__(self, type, cpu, pid, job, when, forced, flags):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = when
+        self.forced = forced
+        self.flags = flags
+
+# 'forced?' is not a valid slot name, but it is the name the field has always
+# had, so keep it readable through getattr()
+setattr(CompletionRecord, 'forced?', property(lambda self: self.forced))
+
+class BlockRecord(EventRecord):
+    __slots__ = []
+    type_name = "block"
+    type_num = 8
+    def __init__(self, type, cpu, pid, job, when):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = when
+
+class ResumeRecord(EventRecord):
+    __slots__ = []
+    type_name = "resume"
+    type_num = 9
+    def __init__(self, type, cpu, pid, job, when):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = when
+
+class ActionRecord(EventRecord):
+    __slots__ = ['action']
+    type_name = "action"
+    type_num = 10
+    def __init__(self, type, cpu, pid, job, when, action):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = when
+        self.action = action
+
+class SysReleaseRecord(EventRecord):
+    __slots__ = ['release']
+    type_name = "sys_release"
+    type_num = 11
+    def __init__(self, type, cpu, pid, job, when, release):
+        self.type, self.cpu, self.pid, self.job = type, cpu, pid, job
+        self.when = when
+        self.release = release
+
+# Record classes indexed by type_num, and their memory-mapped counterparts
+_record_classes = [None,NameRecord,ParamsRecord,ReleaseRecord,AssignRecord,
+    SwitchToRecord,SwitchAwayRecord,CompletionRecord,BlockRecord,ResumeRecord,
+    ActionRecord,SysReleaseRecord]
+_lazy_record_classes = [None] + [
+    type('Lazy' + record_class.__name__, (_LazyRecord, record_class),
+        {'__slots__': ['_data','_offset']})
+    for record_class in _record_classes[1:]]
+
+###############################################################################
+# NumPy support
+###############################################################################
+
+# Return the NumPy structured dtype for a binary data type. The dtype is
+# derived from the struct format of the type, so the two always agree.
+def _get_numpy_dtype(type):
+    if type not in _numpy_dtypes:
+        format = StHeader.format
+        if type is not StHeader:
+            format += type.format
+        names = []
+        formats = []
+        offsets = []
+        keys = iter(type.keys)
+        prefix = format[0]
+        for count, code in re.findall(r'(\d*)(\D)', format[1:]):
+            if code != 'x':
+                names.append(keys.next())
+                if code == 's':
+                    formats.append('S' + count)
+                else:
+                    formats.append(_numpy_codes[code])
+                offsets.append(struct.calcsize(prefix))
+            prefix += count + code
+        _numpy_dtypes[type] = numpy.dtype({'names': names, 'formats': formats,
+            'offsets': offsets, 'itemsize': RECORD_HEAD_SIZE})
+    return _numpy_dtypes[type]
+
+# NumPy equivalents of the struct format codes used above
+_numpy_codes = {'b': 'i1', 'c': 'S1', 'h': '<i2', 'i': '<i4', 'I': '<u4',
+    'Q': '<u8'}
+_numpy_dtypes = {}
+
+# Single-character strings, indexed by character code
+_chars = [chr(code) for code in range(256)]
@@ -21,94 +21,114 @@ def _get_job_from_record(sched, record):
     else:
         tname = _pid_to_task_name(record.pid)
         job_no = record.job
-        if tname not in sched.get_tasks():
+        tasks = sched.get_tasks()
+        if tname not in tasks:
             sched.add_task(Task(tname, []))
-        if job_no not in sched.get_tasks()[tname].get_jobs():
-            sched.get_tasks()[tname].add_job(Job(job_no, []))
-        job = sched.get_tasks()[tname].get_jobs()[job_no]
-        return job
+        jobs = tasks[tname].get_jobs()
+        if job_no not in jobs:
+            tasks[tname].add_job(Job(job_no, []))
+        return jobs[job_no]
 
 def convert_trace_to_schedule(stream):
     """The main function of interest in this module. Coverts a stream of records
     to a Schedule object."""
-    def noop():
-        pass
-
-    num_cpus, stream = _find_num_cpus(stream)
-    sched = Schedule('sched', num_cpus)
+    converter = ScheduleConverter()
     for record in stream:
-        #if record.record_type == 'meta':
-        #    if record.type_name == 'num_cpus':
-        #        sched = Schedule('sched', record.num_cpus)
-        #    continue
-        if record.record_type == 'event':
-            job = _get_job_from_record(sched, record)
-            cpu = record.cpu
+        converter.process(record)
+    return converter.get_schedule()
+
+class ScheduleConverter(object):
+    """Builds a Schedule from records fed to it one at a time, in a single
+    pass, so the records themselves need not be kept around. The number of
+    CPUs is taken from the num_cpus meta record, and grows if an event is
+    seen on a CPU beyond it."""
+
+    def __init__(self):
+        self.sched = Schedule('sched', 1)
+        self.jobs = {}  # (pid, job number) -> Job, for every job seen
 
-            if not hasattr(record, 'deadline'):
-                record.deadline = None
+    def get_schedule(self):
+        return self.sched
+
+    def process(self, record):
+        record_type = record.record_type
+        if record_type == 'event':
+            cpu = record.cpu
+            if cpu >= self.sched.num_cpus:
+                self.sched.num_cpus = cpu + 1
+            job = self._get_job(record)
 
             # This whole method should be refactored for this posibility
             if job is None:
                 if record.type_name == "action":
                     event = ActionEvent(record.when, cpu, record.action)
-                    event.set_schedule(sched)
-                    sched.add_jobless(event)
-                continue
-
-            actions = {
-                'name' : (noop),
-                'params' : (noop),
-                'release' : (lambda :
-                (job.add_event(ReleaseEvent(record.when, cpu)),
-                 job.add_event(DeadlineEvent(record.deadline, cpu)))),
-                'switch_to' : (lambda :
-                job.add_event(SwitchToEvent(record.when, cpu))),
-                'switch_away' : (lambda :
-                job.add_event(SwitchAwayEvent(record.when, cpu))),
-                'assign' : (noop),
-                'completion' : (lambda :
-                job.add_event(CompleteEvent(record.when, cpu))),
-                'block' : (lambda :
-                job.add_event(SuspendEvent(record.when, cpu))),
-                'resume' : (lambda :
-                job.add_event(ResumeEvent(record.when, cpu))),
-                'action' : (lambda :
-                job.add_event(ActionEvent(record.when, cpu, record.action))),
-                'sys_release' : (noop)
-            }
-
-            actions[record.type_name]()
-
-        elif record.record_type == 'error':
-            job = _get_job_from_record(sched, record.job)
-
-            actions = {
-                'inversion_start' : (lambda :
-                job.add_event(InversionStartEvent(record.job.inversion_start))),
-                'inversion_end' : (lambda :
-                job.add_event(InversionEndEvent(record.job.inversion_end)))
-            }
-
-            actions[record.type_name]()
-
-    return sched
+                    event.set_schedule(self.sched)
+                    self.sched.add_jobless(event)
+                return
+
+            add_events = _EVENT_ACTIONS[record.type_name]
+            if add_events is not None:
+                add_events(job, record, cpu)
+
+        elif record_type == 'error':
+            job = self._get_job(record.job)
+            _ERROR_ACTIONS[record.type_name](job, record.job)
+
+        elif record_type == 'meta':
+            if record.type_name == 'num_cpus':
+                self.sched.num_cpus = max(self.sched.num_cpus,
+                                          record.num_cpus)
+
+    def _get_job(self, record):
+        """Returns the Job of a record (creating its task and job the first
+        time), or None for records without a task"""
+        key = (record.pid, record.job)
+        try:
+            return self.jobs[key]
+        except KeyError:
+            job = _get_job_from_record(self.sched, record)
+            self.jobs[key] = job
+            return job
+
+def _add_release(job, record, cpu):
+    job.add_event(ReleaseEvent(record.when, cpu))
+    job.add_event(DeadlineEvent(record.deadline, cpu))
+
+def _add_action(job, record, cpu):
+    job.add_event(ActionEvent(record.when, cpu, record.action))
+
+def _event_adder(event_class):
+    """Returns a function adding an event of the given class, at the time and
+    on the CPU of a record, to a job"""
+    def add_event(job, record, cpu):
+        job.add_event(event_class(record.when, cpu))
+    return add_event
+
+# The function adding the events for each type of event record to its job
+# (None for records that do not show up in the schedule)
+_EVENT_ACTIONS = {
+    'name' : None,
+    'params' : None,
+    'release' : _add_release,
+    'switch_to' : _event_adder(SwitchToEvent),
+    'switch_away' : _event_adder(SwitchAwayEvent),
+    'assign' : None,
+    'completion' : _event_adder(CompleteEvent),
+    'block' : _event_adder(SuspendEvent),
+    'resume' : _event_adder(ResumeEvent),
+    'action' : _add_action,
+    'sys_release' : None
+}
+
+# The function adding the event for each type of error record to its job,
+# given the job (as in the schedule) and the job the error is about
+_ERROR_ACTIONS = {
+    'inversion_start' : (lambda job, error_job :
+        job.add_event(InversionStartEvent(error_job.inversion_start))),
+    'inversion_end' : (lambda job, error_job :
+        job.add_event(InversionEndEvent(error_job.inversion_end)))
+}
 
 def _pid_to_task_name(pid):
     """Converts a PID to an appropriate name for a task."""
     return str(pid)
-
-def _find_num_cpus(stream):
-    """Determines the number of CPUs used by scanning the binary format."""
-    max = 0
-    stream_list = []
-    for record in stream:
-        stream_list.append(record)
-        if record.record_type == 'event':
-            if record.cpu > max:
-                max = record.cpu
-
-    def recycle(l):
-        for record in l:
-            yield record
-    return (max + 1, recycle(stream_list))
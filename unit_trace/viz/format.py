@@ -34,6 +34,8 @@ class GraphFormat(object):
     BAND_THICKNESS = 1.5
     BAND_COLOR = (0.85, 0.0, 0.0)
 
+    SUMMARY_COLOR = (0.3, 0.3, 0.6)
+
     X_AXIS_MEASURE_OFS = 30
     X_AXIS_LABEL_GAP = 10
     Y_AXIS_ITEM_GAP = 10
@@ -171,7 +171,9 @@ class Graph(object):
         raise NotImplementedError
 
     def get_events_to_render(self, sched, regions, selectable=False):
-        slots = {}
+        events_to_render = {}
+        for layer in Canvas.LAYERS:
+            events_to_render[layer] = {}
 
         self.min_time, self.max_time, self.min_item, self.max_item = None, None, None, None
         for region in regions:
@@ -179,22 +181,45 @@ class Graph(object):
             start_time, end_time, start_item, end_item = self.get_offset_params(x, y, width, height)
             self._recomp_min_max(start_time, end_time, start_item, end_item)
 
-            sched.get_time_slot_array().get_slots(slots,
-                        start_time, end_time, start_item, end_item,
-                        self.list_type)
+            self._add_events_in_region(sched, events_to_render, start_time, end_time,
+                start_item, end_item, width, self.list_type, schedule.EVENT_LIST)
 
-        events_to_render = {}
-        for layer in Canvas.LAYERS:
-            events_to_render[layer] = {}
-
-        for event in sched.get_time_slot_array().get_events(slots,
-                self.list_type, schedule.EVENT_LIST):
-            events_to_render[event.get_layer()][event] = None
         for event in sched.get_jobless():
             events_to_render[event.get_layer()][event] = None
 
         return events_to_render
 
+    def _add_events_in_region(self, sched, events_to_render, start_time, end_time,
+                              start_item, end_item, width, list_type, event_types):
+        """Adds the events of the given types for items start_item to end_item,
+        from time start_time to end_time, to events_to_render. ``width'' is
+        the width of the region in pixels: an item with more events than that
+        in the region is drawn from the schedule's summary instead, as one
+        SummaryBucket per pixel or so, since its events could not be told
+        apart anyway."""
+        index = sched.get_event_index()
+        summary = sched.get_summary()
+        level = 0
+        if summary is not None:
+            time_per_pixel = 1.0 * self.attrs.time_per_maj / (self.attrs.maj_sep * self.canvas.scale)
+            level = summary.get_level(time_per_pixel)
+
+        for item_no in index.get_item_nos(start_item, end_item, list_type):
+            if summary is not None and \
+                    summary.get_count(level, list_type, item_no, start_time, end_time) > width:
+                row = item_no
+                if item_no == schedule.EventIndex.POST_ITEM_NO:
+                    row = len(self.y_item_list)
+                for bucket in summary.get_buckets(level, list_type, item_no, start_time, end_time):
+                    start, end, utilization, flags = bucket
+                    event = schedule.SummaryBucket((list_type, level, item_no, start),
+                                                   start, end, row, utilization, flags)
+                    events_to_render[event.get_layer()][event] = None
+            else:
+                for event in index.get_item_events(start_time, end_time, item_no,
+                                                   list_type, event_types):
+                    events_to_render[event.get_layer()][event] = None
+
     def render_surface(self, sched, regions, selectable=False):
         if not selectable:
             self.canvas.whiteout()
@@ -309,6 +334,22 @@ class Graph(object):
         """Draws a bar over a certain time period for some task, optionally labelling it."""
         raise NotImplementedError
 
+    def draw_summary_at_time(self, start_time, end_time, item_no, utilization, flags):
+        """Draws what happened to an item over a certain time period, when there is too much
+        to draw: a bar as tall as the fraction of the time it was running, with a band above it
+        if there was an inversion or a deadline miss."""
+        x = self.get_time_xpos(start_time)
+        y = self.get_item_ypos(item_no)
+        width = self._get_bar_width(start_time, end_time)
+        height = self._get_bar_height()
+
+        if utilization > 0:
+            self.canvas.fill_rect(x, y + height * (1.0 - utilization), width,
+                                  height * utilization, GraphFormat.SUMMARY_COLOR)
+        if flags:
+            self.canvas.fill_rect(x, y - self._get_mini_bar_ofs(), width,
+                                  self._get_mini_bar_height(), GraphFormat.BAND_COLOR)
+
     def add_sel_bar_at_time(self, start_time, end_time, task_no, cpu_no, event):
         """Same as above, except instead of drawing adds a selectable region at
         a certain time."""
@@ -325,7 +366,9 @@ class Graph(object):
 
 class TaskGraph(Graph):
     def get_events_to_render(self, sched, regions, selectable=False):
-        slots = {}
+        events_to_render = {}
+        for layer in Canvas.LAYERS:
+            events_to_render[layer] = {}
 
         self.min_time, self.max_time, self.min_item, self.max_item = None, None, None, None
         for region in regions:
@@ -333,24 +376,14 @@ class TaskGraph(Graph):
             start_time, end_time, start_item, end_item = self.get_offset_params(x, y, width, height)
             self._recomp_min_max(start_time, end_time, start_item, end_item)
 
-            sched.get_time_slot_array().get_slots(slots,
-                        start_time, end_time, start_item, end_item,
-                        schedule.TimeSlotArray.TASK_LIST)
-
+            self._add_events_in_region(sched, events_to_render, start_time, end_time,
+                start_item, end_item, width, schedule.EventIndex.TASK_LIST,
+                schedule.EVENT_LIST)
 
         if not selectable:
             self.draw_skeleton(self.min_time, self.max_time,
                                self.min_item, self.max_item)
 
-        events_to_render = {}
-        for layer in Canvas.LAYERS:
-            events_to_render[layer] = {}
-
-        for event in sched.get_time_slot_array().get_events(slots,
-                schedule.TimeSlotArray.TASK_LIST,
-                schedule.EVENT_LIST):
-            events_to_render[event.get_layer()][event] = None
-
         return events_to_render
 
     def draw_suspend_triangle_at_time(self, time, task_no, cpu_no, selected=False):
@@ -518,8 +551,9 @@ class CpuGraph(Graph):
         if not regions:
             return {}
 
-        top_slots = {}
-        bottom_slots = {}
+        events_to_render = {}
+        for layer in Canvas.LAYERS:
+            events_to_render[layer] = {}
 
         self.min_time, self.max_time, self.min_item, self.max_item = None, None, None, None
         for region in regions:
@@ -527,34 +561,20 @@ class CpuGraph(Graph):
             start_time, end_time, start_item, end_item = self.get_offset_params(x, y, width, height)
             self._recomp_min_max(start_time, end_time, start_item, end_item)
 
-            sched.get_time_slot_array().get_slots(top_slots,
-                        start_time, end_time, start_item, end_item,
-                        schedule.TimeSlotArray.CPU_LIST)
+            self._add_events_in_region(sched, events_to_render, start_time, end_time,
+                start_item, end_item, width, schedule.EventIndex.CPU_LIST, TOP_EVENTS)
 
             if end_item >= len(self.y_item_list):
                 # we are far down enough that we should render the releases and deadlines and inversions,
-                # which appear near the x-axis
-                sched.get_time_slot_array().get_slots(bottom_slots,
-                        start_time, end_time, 0, sched.get_num_cpus(),
-                        schedule.TimeSlotArray.CPU_LIST)
+                # which appear near the x-axis (for a CPU too busy to draw event by event, its summary
+                # stands for these too)
+                self._add_events_in_region(sched, events_to_render, start_time, end_time,
+                    0, sched.get_num_cpus(), width, schedule.EventIndex.CPU_LIST, BOTTOM_EVENTS)
 
         if not selectable:
             self.draw_skeleton(self.min_time, self.max_time,
                                self.min_item, self.max_item)
 
-        events_to_render = {}
-        for layer in Canvas.LAYERS:
-            events_to_render[layer] = {}
-
-        for event in sched.get_time_slot_array().get_events(top_slots,
-                schedule.TimeSlotArray.CPU_LIST,
-                TOP_EVENTS):
-            events_to_render[event.get_layer()][event] = None
-        for event in sched.get_time_slot_array().get_events(bottom_slots,
-                schedule.TimeSlotArray.CPU_LIST,
-                BOTTOM_EVENTS):
-            events_to_render[event.get_layer()][event] = None
-
         return events_to_render
 
     def render(self, schedule, start_time=None, end_time=None):
@@ -8,106 +8,110 @@ graphic."""
 from graph import *
 import util
 
+import bisect
 import copy
 
 EVENT_LIST = None
 SPAN_EVENTS = None
 
-class TimeSlotArray(object):
-    """Represents another way of organizing the events. This structure organizes events by
-    the (approximate) time at which they occur. Events that occur at approximately the same
-    time are assigned the same ``slot'', and each slot organizes its events by task number
-    as well as by CPU."""
+# Number of buckets the schedule is split into at the finest level of its
+# SummaryPyramid
+LOD_BUCKETS = 16384
+
+class EventIndex(object):
+    """Organizes the events by the item (task or CPU) they belong to and by the
+    time at which they occur, so that the events in a region of a graph can be
+    found quickly. For each item and event class, the events are kept in an
+    array sorted by time, searched with binary search. Span events (a
+    SwitchToEvent and its SwitchAwayEvent, or an inversion) are also kept as
+    intervals in a SpanTree per item, under the class of the dummy event that
+    used to fill the time between them, so a span that crosses a region is
+    found without any dummy events: the event that renders the span is
+    returned instead.
+
+    Events are added while the schedule is scanned, after which finish() must
+    be called before any query."""
 
     TASK_LIST = 0
     CPU_LIST = 1
 
-    def __init__(self, time_per_maj=None, num_tasks=0, num_cpus=0):
-        if time_per_maj is None:
-            self.array = None
-            return
+    # Item of the events that are not on a CPU (e.g. inversions), in the CPU
+    # list. Such events are returned by queries that reach past the last CPU.
+    POST_ITEM_NO = -1
 
+    def __init__(self, time_per_maj=None, num_tasks=0, num_cpus=0):
         self.time_per_maj = time_per_maj
-        self.list_sizes = { TimeSlotArray.TASK_LIST : num_tasks, TimeSlotArray.CPU_LIST : num_cpus }
-        self.array = {}
-
-        for type in self.list_sizes:
-            num = self.list_sizes[type]
-            self.array[type] = []
-            for j in range(0, num):
-                # for each slot in the array, we need a list of all events under this type
-                # (for example, a list of all events that occur in this time slot, indexed
-                # by task).
-                self.array[type].append(dict(zip(EVENT_LIST, \
-                                [{} for j in range(0, len(EVENT_LIST))])))
+        self.list_sizes = { EventIndex.TASK_LIST : num_tasks, EventIndex.CPU_LIST : num_cpus }
 
-    def get_time_slot(self, time):
-        return int(time // self.time_per_maj)
+        # list type -> (item no, event class) -> events sorted by time, and
+        # their times
+        self.events = { EventIndex.TASK_LIST : {}, EventIndex.CPU_LIST : {} }
+        self.times = { EventIndex.TASK_LIST : {}, EventIndex.CPU_LIST : {} }
 
-    def _put_event_in_slot(self, list_type, no, klass, slot, event):
-        if slot not in self.array[list_type][no][klass]:
-            self.array[list_type][no][klass][slot] = []
-        self.array[list_type][no][klass][slot].append(event)
+        # list type -> (item no, dummy class) -> spans, as (start, end, event)
+        # tuples, where event is the event that renders the span. A start or
+        # end of None stands for the start or end of the schedule. Once
+        # finished, the spans of each item and class are in a SpanTree.
+        self.spans = { EventIndex.TASK_LIST : {}, EventIndex.CPU_LIST : {} }
 
-    def add_event_to_time_slot(self, event):
-        task_no = event.get_job().get_task().get_task_no()
-        cpu = event.get_cpu()
-        time_slot = self.get_time_slot(event.get_time())
+    def get_time_slot(self, time):
+        return int(time // self.time_per_maj)
 
-        self._put_event_in_slot(TimeSlotArray.TASK_LIST, task_no, event.__class__, time_slot, event)
-        self._put_event_in_slot(TimeSlotArray.CPU_LIST, cpu, event.__class__, time_slot, event)
+    def add_event(self, event, item_nos):
+        for list_type, no in item_nos.iteritems():
+            key = (no, event.__class__)
+            if key not in self.events[list_type]:
+                self.events[list_type][key] = []
+            self.events[list_type][key].append(event)
 
         if event.__class__ in SPAN_END_EVENTS:
-            self.fill_span_event_from_end(event)
-
-    def fill_span_event_from_end(self, event):
-        start_slot = None
-        if event.corresp_start_event is None:
-            start_slot = self.get_time_slot(event.get_job().get_task().get_schedule().start) - 1
-        else:
-            start_slot = self.get_time_slot(event.corresp_start_event.get_time())
-        end_slot = self.get_time_slot(event.get_time())
-
-        for slot in range(start_slot + 1, end_slot):
-            task_no = event.get_job().get_task().get_task_no()
-            cpu = event.get_cpu()
-
-            dummy = SPAN_END_EVENTS[event.__class__](task_no, cpu)
-            dummy.corresp_start_event = event.corresp_start_event
-            dummy.corresp_end_event = event
+            self.add_span_from_end(event)
 
-            self._put_event_in_slot(TimeSlotArray.TASK_LIST, task_no, dummy.__class__, slot, dummy)
-            self._put_event_in_slot(TimeSlotArray.CPU_LIST, cpu, dummy.__class__, slot, dummy)
-
-    def fill_span_event_from_start(self, event):
-        end_slot = None
-        if event.corresp_end_event is None:
-            end_slot = self.get_time_slot(event.get_job().get_task().get_schedule().end) + 1
+    def add_span_from_end(self, event):
+        if event.corresp_start_event is not None:
+            self._add_span(SPAN_END_EVENTS[event.__class__],
+                           event.corresp_start_event.get_time(), event.get_time(),
+                           event.corresp_start_event, event)
         else:
-            end_slot = self.get_time_slot(event.corresp_end_event.get_time())
-        start_slot = self.get_time_slot(event.get_time())
-
-        for slot in range(start_slot + 1, end_slot):
-            task_no = event.get_job().get_task().get_task_no()
-            cpu = event.get_cpu()
-
-            dummy = SPAN_START_EVENTS[event.__class__](task_no, cpu)
-            dummy.corresp_start_event = event
-            dummy.corresp_end_event = event.corresp_end_event
-
-            self._put_event_in_slot(TimeSlotArray.TASK_LIST, task_no, dummy.__class__, slot, dummy)
-            self._put_event_in_slot(TimeSlotArray.CPU_LIST, cpu, dummy.__class__, slot, dummy)
-
-    def get_events(self, slots, list_type, event_types):
-        for type in event_types:
-            for slot in slots:
-                for no in slots[slot]:
-                    if slot in self.array[list_type][no][type]:
-                        for event in self.array[list_type][no][type][slot]:
-                            yield event
-
-    def get_slots(self, slots, start, end, start_no, end_no, list_type):
-        if self.array is None:
+            self._add_span(SPAN_END_EVENTS[event.__class__], None, event.get_time(),
+                           event, event)
+
+    def add_span_from_start(self, event):
+        """Adds the span of a start event that never got a corresponding end
+        event, which lasts until the end of the schedule."""
+        self._add_span(SPAN_START_EVENTS[event.__class__], event.get_time(), None,
+                       event, event)
+
+    def _add_span(self, dummy_class, start, end, render_event, item_event):
+        item_nos = { EventIndex.TASK_LIST : item_event.get_job().get_task().get_task_no(),
+                     EventIndex.CPU_LIST : item_event.get_cpu() }
+        for list_type, no in item_nos.iteritems():
+            key = (no, dummy_class)
+            if key not in self.spans[list_type]:
+                self.spans[list_type][key] = []
+            self.spans[list_type][key].append((start, end, render_event))
+
+    def finish(self, sched_start, sched_end):
+        """Sorts everything that was added, given the start and end of the
+        schedule."""
+        for list_type in self.events:
+            for key, events in self.events[list_type].iteritems():
+                events.sort(key=lambda event: event.get_time())
+                self.times[list_type][key] = [event.get_time() for event in events]
+
+            for key, spans in self.spans[list_type].iteritems():
+                self.spans[list_type][key] = SpanTree(
+                    [(_default(start, sched_start), _default(end, sched_end), event)
+                     for start, end, event in spans])
+
+    def get_events(self, start, end, start_no, end_no, list_type, event_types):
+        """Yields the events of the given types for items start_no to end_no,
+        from time start to end. As with the time slots this index replaces, the
+        times are widened to whole major ticks (plus one tick after the end), so
+        that events drawn across the edge of the region are included. Span
+        events yield the event that renders the span, when the span overlaps
+        that time."""
+        if self.time_per_maj is None:
             return # empty schedule
 
         if start > end:
@@ -115,16 +119,274 @@ class TimeSlotArray(object):
         if start_no > end_no:
             raise ValueError('start no should be less than end no')
 
-        start_slot = self.get_time_slot(start)
-        end_slot = self.get_time_slot(end) + 1
-        start_no = max(0, start_no)
-        end_no = min(self.list_sizes[list_type] - 1, end_no)
+        for no in self.get_item_nos(start_no, end_no, list_type):
+            for event in self.get_item_events(start, end, no, list_type, event_types):
+                yield event
 
-        for slot in xrange(start_slot, end_slot + 1):
-            if slot not in slots:
-                slots[slot] = {}
-            for no in xrange(start_no, end_no + 1):
-                slots[slot][no] = None
+    def get_item_nos(self, start_no, end_no, list_type):
+        """Returns the numbers of the items from start_no to end_no that hold
+        events, including POST_ITEM_NO if end_no is past the last item."""
+        nos = range(max(0, start_no), min(self.list_sizes[list_type] - 1, end_no) + 1)
+        if end_no >= self.list_sizes[list_type]:
+            nos.append(EventIndex.POST_ITEM_NO)
+        return nos
+
+    def get_item_events(self, start, end, no, list_type, event_types):
+        """Like get_events, for a single item."""
+        if self.time_per_maj is None:
+            return # empty schedule
+
+        start = self.get_time_slot(start) * self.time_per_maj
+        end = (self.get_time_slot(end) + 2) * self.time_per_maj
+
+        for type in event_types:
+            key = (no, type)
+            if key in self.events[list_type]:
+                times = self.times[list_type][key]
+                events = self.events[list_type][key]
+                for i in xrange(bisect.bisect_left(times, start),
+                                bisect.bisect_left(times, end)):
+                    yield events[i]
+
+            if key in self.spans[list_type]:
+                for event in self.spans[list_type][key].get_overlapping(start, end):
+                    yield event
+
+class SpanTree(object):
+    """A static interval tree over spans, given as (start, end, event) tuples.
+    The spans are sorted by start, and the array is treated as a balanced
+    binary tree: the root of the spans from lo up to hi is the one in the
+    middle, with the spans before it to its left and those after it to its
+    right. Each node also records the latest end in its subtree, so that
+    finding the spans overlapping some time takes O(log n + k) for k spans
+    found, however long the spans are."""
+
+    def __init__(self, spans):
+        spans.sort(key=lambda span: span[0])
+        self.spans = spans
+        self.starts = [span[0] for span in spans]
+        self.max_ends = [None] * len(spans)
+        if spans:
+            self._compute_max_end(0, len(spans))
+
+    def _compute_max_end(self, lo, hi):
+        mid = (lo + hi) // 2
+        max_end = self.spans[mid][1]
+        if lo < mid:
+            max_end = max(max_end, self._compute_max_end(lo, mid))
+        if mid + 1 < hi:
+            max_end = max(max_end, self._compute_max_end(mid + 1, hi))
+        self.max_ends[mid] = max_end
+        return max_end
+
+    def get_overlapping(self, start, end):
+        """Yields the event of every span that starts before end and ends at or
+        after start."""
+        # spans from this index on start too late
+        last = bisect.bisect_left(self.starts, end)
+        stack = [(0, len(self.spans))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_ends[mid] < start:
+                continue # everything in this subtree ends too early
+            stack.append((lo, mid))
+            if mid < last:
+                if self.spans[mid][1] >= start:
+                    yield self.spans[mid][2]
+                stack.append((mid + 1, hi))
+
+class SummaryPyramid(object):
+    """A multi-resolution summary of a schedule, for drawing it when zoomed out
+    too far to make out individual events. Level 0 splits the schedule into
+    about LOD_BUCKETS buckets of equal width (a power of two), and each level
+    after that has buckets twice as wide as the one before, up to a single
+    bucket. For each item (task or CPU) and bucket, a level holds the time the
+    item was running, the number of events, and flags telling whether there
+    was an inversion or a deadline miss. Only buckets with something in them
+    are kept, in arrays sorted by bucket number, along with running totals of
+    the event counts, so that the events of an item in some time can be
+    counted with two binary searches."""
+
+    INVERSION = 1
+    DEADLINE_MISS = 2
+
+    def __init__(self, sched):
+        # level -> list type -> item no -> (buckets, busy times, event counts,
+        # flags, running totals of the event counts), each a list in order of
+        # bucket number
+        self.levels = []
+
+        self.start, end = sched.get_time_bounds()
+        if self.start is None:
+            return
+        self.width = 1
+        while self.width * LOD_BUCKETS < end - self.start:
+            self.width *= 2
+
+        self.levels.append(self._get_rows(self._build_first_level(sched)))
+        while self.width << (len(self.levels) - 1) <= end - self.start:
+            self.levels.append(self._merge_rows(self.levels[-1]))
+
+    def get_level(self, time_per_pixel):
+        """Returns the level with the widest buckets that are no wider than
+        time_per_pixel (or level 0, if they all are)."""
+        level = 0
+        while level + 1 < len(self.levels) and \
+                self.width << (level + 1) <= time_per_pixel:
+            level += 1
+        return level
+
+    def get_bucket_width(self, level):
+        return self.width << level
+
+    def get_count(self, level, list_type, no, start, end):
+        """Returns the number of events of an item in the buckets of a level
+        holding the times from start to end."""
+        if not self.levels or no not in self.levels[level][list_type]:
+            return 0
+        buckets, busy, counts, flags, count_sums = self.levels[level][list_type][no]
+        first, last = self._get_bucket_range(level, buckets, start, end)
+        if first == last:
+            return 0
+        return count_sums[last - 1] - count_sums[first] + counts[first]
+
+    def get_buckets(self, level, list_type, no, start, end):
+        """Yields (start, end, utilization, flags) for the buckets of a level
+        holding the times from start to end, where something happened to the
+        item."""
+        if not self.levels or no not in self.levels[level][list_type]:
+            return
+        width = self.get_bucket_width(level)
+        buckets, busy, counts, flags, count_sums = self.levels[level][list_type][no]
+        first, last = self._get_bucket_range(level, buckets, start, end)
+        for i in xrange(first, last):
+            bucket_start = self.start + buckets[i] * width
+            yield (bucket_start, bucket_start + width, min(1.0, 1.0 * busy[i] / width),
+                   flags[i])
+
+    def _get_bucket_range(self, level, buckets, start, end):
+        width = self.get_bucket_width(level)
+        return (bisect.bisect_left(buckets, int((start - self.start) // width)),
+                bisect.bisect_right(buckets, int((end - self.start) // width)))
+
+    def _build_first_level(self, sched):
+        """Returns level 0, as a dict of list type -> (item no, bucket) ->
+        [busy time, event count, flags]"""
+        index = sched.get_event_index()
+        level = { EventIndex.TASK_LIST : {}, EventIndex.CPU_LIST : {} }
+
+        for list_type in level:
+            buckets = level[list_type]
+            for (no, klass), events in index.events[list_type].iteritems():
+                for event in events:
+                    self._get_bucket(buckets, no, event.get_time())[1] += 1
+
+            for (no, klass), tree in index.spans[list_type].iteritems():
+                for start, end, event in tree.spans:
+                    if klass is IsRunningDummy:
+                        self._add_busy_time(buckets, no, start, end)
+                    else:
+                        self._add_flags(buckets, no, start, end,
+                                        SummaryPyramid.INVERSION)
+
+        # A job misses its deadline if it completes after it
+        for task in sched.get_task_list():
+            for job in task.get_jobs().itervalues():
+                deadline, completion = None, None
+                for events in job.get_events().itervalues():
+                    for event in events:
+                        if isinstance(event, DeadlineEvent):
+                            deadline = event
+                        elif isinstance(event, CompleteEvent):
+                            completion = event
+                if deadline is not None and completion is not None and \
+                        completion.get_time() > deadline.get_time():
+                    time = completion.get_time()
+                    self._add_flags(level[EventIndex.TASK_LIST], task.get_task_no(),
+                                    time, time, SummaryPyramid.DEADLINE_MISS)
+                    self._add_flags(level[EventIndex.CPU_LIST], completion.get_cpu(),
+                                    time, time, SummaryPyramid.DEADLINE_MISS)
+
+        return level
+
+    def _get_bucket(self, buckets, no, time):
+        key = (no, int((time - self.start) // self.width))
+        if key not in buckets:
+            buckets[key] = [0, 0, 0]
+        return buckets[key]
+
+    def _add_busy_time(self, buckets, no, start, end):
+        first = int((start - self.start) // self.width)
+        last = int((end - self.start) // self.width)
+        for bucket in xrange(first, last + 1):
+            if (no, bucket) not in buckets:
+                buckets[no, bucket] = [0, 0, 0]
+            buckets[no, bucket][0] += self.width
+        # only the buckets at either end can be partly busy
+        buckets[no, first][0] -= start - (self.start + first * self.width)
+        buckets[no, last][0] -= self.start + (last + 1) * self.width - end
+
+    def _add_flags(self, buckets, no, start, end, flags):
+        first = int((start - self.start) // self.width)
+        last = int((end - self.start) // self.width)
+        for bucket in xrange(first, last + 1):
+            if (no, bucket) not in buckets:
+                buckets[no, bucket] = [0, 0, 0]
+            buckets[no, bucket][2] |= flags
+
+    def _get_rows(self, level):
+        """Converts a level to the arrays kept for it"""
+        rows = {}
+        for list_type in level:
+            rows[list_type] = {}
+            keys = sorted(level[list_type])
+            for no, bucket in keys:
+                if no not in rows[list_type]:
+                    rows[list_type][no] = ([], [], [], [], [])
+                buckets, busy, counts, flags, count_sums = rows[list_type][no]
+                values = level[list_type][no, bucket]
+                buckets.append(bucket)
+                busy.append(values[0])
+                counts.append(values[1])
+                flags.append(values[2])
+                count_sums.append(values[1] + (count_sums[-1] if count_sums else 0))
+        return rows
+
+    def _merge_rows(self, rows):
+        """Returns the arrays of the level after the one given, merging each
+        pair of neighbouring buckets"""
+        merged = {}
+        for list_type in rows:
+            merged[list_type] = {}
+            for no, (buckets, busy, counts, flags, count_sums) in rows[list_type].iteritems():
+                new_buckets, new_busy, new_counts, new_flags = [], [], [], []
+                for i in xrange(len(buckets)):
+                    bucket = buckets[i] >> 1
+                    if new_buckets and new_buckets[-1] == bucket:
+                        new_busy[-1] += busy[i]
+                        new_counts[-1] += counts[i]
+                        new_flags[-1] |= flags[i]
+                    else:
+                        new_buckets.append(bucket)
+                        new_busy.append(busy[i])
+                        new_counts.append(counts[i])
+                        new_flags.append(flags[i])
+                new_count_sums = []
+                total = 0
+                for count in new_counts:
+                    total += count
+                    new_count_sums.append(total)
+                merged[list_type][no] = (new_buckets, new_busy, new_counts, new_flags,
+                                         new_count_sums)
+        return merged
+
+def _default(value, default):
+    if value is None:
+        return default
+    return value
 
 class Schedule(object):
     """The total schedule (task system), consisting of a certain number of
@@ -135,7 +397,8 @@ class Schedule(object):
         self.tasks = {}
         self.task_list = []
         self.selected = {}
-        self.time_slot_array = None
+        self.event_index = None
+        self.summary = None
         self.cur_task_no = 0
         self.num_cpus = num_cpus
         self.jobless = []
@@ -168,14 +431,17 @@ class Schedule(object):
     def set_time_params(self, time_per_maj=None):
         self.time_per_maj = time_per_maj
         if self.time_per_maj is None:
-            self.time_slot_array = TimeSlotArray()
+            self.event_index = EventIndex()
             return
 
-        self.time_slot_array = TimeSlotArray(self.time_per_maj, \
-                                                 len(self.task_list), self.num_cpus)
+        self.event_index = EventIndex(self.time_per_maj, \
+                                          len(self.task_list), self.num_cpus)
 
-    def get_time_slot_array(self):
-        return self.time_slot_array
+    def get_event_index(self):
+        return self.event_index
+
+    def get_summary(self):
+        return self.summary
 
     def get_time_bounds(self):
         return (self.start, self.end)
@@ -207,7 +473,10 @@ class Schedule(object):
             for span_event in SPAN_START_EVENTS:
                 event = switches[span_event]
                 if event is not None:
-                    self.time_slot_array.fill_span_event_from_start(event)
+                    self.event_index.add_span_from_start(event)
+
+        self.event_index.finish(self.start, self.end)
+        self.summary = SummaryPyramid(self)
 
     def add_task(self, task):
         if task.name in self.tasks:
@@ -419,14 +688,15 @@ class Event(DummyEvent):
         selected = self.get_job().get_task().get_schedule().get_selected()
         return self.get_layer() in selected and self in selected[self.get_layer()]
 
-    def scan(self, cur_cpu, switches):
+    def scan(self, cur_cpu, switches, item_nos=None):
         """Part of the procedure that walks through all the events and sets
         some parameters that are unknown at first. For instance, a SwitchAwayEvent
         should know when the previous corresponding SwitchToEvent occurred, but
         the data does not tell us this, so we have to figure that out on our own
         by scanning through the events. ``cur_cpu'' gives the current CPU at this
         time in the scan, and ``switches'' gives the last time a certain switch
-        (e.g. SwitchToEvent, InversionStartEvent) occurred"""
+        (e.g. SwitchToEvent, InversionStartEvent) occurred. ``item_nos'' gives
+        the task and CPU to file the event under, if not its own"""
         time = self.get_time()
 
         sched = self.get_schedule()
@@ -438,9 +708,9 @@ class Event(DummyEvent):
                 sched.end = time
 
             if item_nos is None:
-                item_nos = { TimeSlotArray.TASK_LIST : self.get_task().get_task_no(),
-                             TimeSlotArray.CPU_LIST : self.get_cpu() }
-            sched.get_time_slot_array().add_event_to_time_slot(self, item_nos)
+                item_nos = { EventIndex.TASK_LIST : self.get_task().get_task_no(),
+                             EventIndex.CPU_LIST : self.get_cpu() }
+            sched.get_event_index().add_event(self, item_nos)
 
         self.fill_span_event_from_end()
 
@@ -739,8 +1009,8 @@ class ActionEvent(Event):
         return 'Action'
 
     def scan(self, cur_cpu, switches):
-        item_nos = { TimeSlotArray.TASK_LIST : self.get_task().get_task_no(),
-                     TimeSlotArray.CPU_LIST : TimeSlotArray.POST_ITEM_NO }
+        item_nos = { EventIndex.TASK_LIST : self.get_task().get_task_no(),
+                     EventIndex.CPU_LIST : EventIndex.POST_ITEM_NO }
         super(ActionEvent, self).scan(cur_cpu, switches, item_nos)
 
     def render(self, graph, layer, prev_events, selectable=False):
@@ -914,11 +1184,39 @@ class IsRunningDummy(DummyEvent):
                 return # we have already been rendered
             self.corresp_start_event.render(graph, layer, prev_events, selectable)
 
+class SummaryBucket(DummyEvent):
+    """Stands for the events of an item in a bucket of the SummaryPyramid, when
+    they are too dense to be drawn one by one. Buckets are equal if they are
+    the same bucket of the same item, so each is drawn once."""
+    def __init__(self, key, start, end, item_no, utilization, flags):
+        super(SummaryBucket, self).__init__(start, Event.NO_CPU)
+        self.layer = Canvas.BOTTOM_LAYER
+        self.key = key
+        self.end = end
+        self.item_no = item_no
+        self.utilization = utilization
+        self.flags = flags
+
+    def __eq__(self, other):
+        return isinstance(other, SummaryBucket) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def render(self, graph, layer, prev_events, selectable=False):
+        if layer == self.layer and not selectable:
+            prev_events[self] = None
+            graph.draw_summary_at_time(self.get_time(), self.end, self.item_no,
+                                       self.utilization, self.flags)
+
 EVENT_LIST = {SuspendEvent : None, ResumeEvent : None, CompleteEvent : None,
               SwitchAwayEvent : None, SwitchToEvent : None, ReleaseEvent : None,
               DeadlineEvent : None, IsRunningDummy : None,
               InversionStartEvent : None, InversionEndEvent : None,
-              InversionDummy : None, TaskDummy : None, CPUDummy : None, ActionEvent: None}
+              InversionDummy : None, ActionEvent: None}
 
 SPAN_START_EVENTS = { SwitchToEvent : IsRunningDummy, InversionStartEvent : InversionDummy }
 SPAN_END_EVENTS = { SwitchAwayEvent : IsRunningDummy, InversionEndEvent : InversionDummy}
@@ -10,6 +10,9 @@ import gtk
 
 def visualizer(stream, time_per_maj):
     sched = convert.convert_trace_to_schedule(stream)
+    _show_schedule(sched, time_per_maj)
+
+def _show_schedule(sched, time_per_maj):
     sched.scan(time_per_maj)
 
     task_renderer = renderer.Renderer(sched)
@@ -21,3 +24,18 @@ def visualizer(stream, time_per_maj):
     window.set_renderers({'Tasks' : task_renderer, 'CPUs' : cpu_renderer})
 
     gtk.main()
+
+class Visualizer(object):
+    """Sink for the dispatcher (see dispatcher.py). The schedule is built
+    as the records go by, and the visualizer is shown once the stream is
+    finished."""
+
+    def __init__(self, time_per_maj):
+        self.time_per_maj = time_per_maj
+        self.converter = convert.ScheduleConverter()
+
+    def process(self, record):
+        self.converter.process(record)
+
+    def finish(self):
+        _show_schedule(self.converter.get_schedule(), self.time_per_maj)
@@ -15,12 +15,25 @@ import sys
 ###############################################################################
 
 def warning_printer(stream):
-    out_of_order_ids = []
+    printer = WarningPrinter()
     for record in stream:
+        printer.process(record)
+    printer.finish()
+
+# Sink for the dispatcher (see dispatcher.py), printing the warnings once all
+# records have been seen
+class WarningPrinter(object):
+
+    def __init__(self):
+        self.out_of_order_ids = []
+
+    def process(self, record):
         if (record.record_type == "meta" and
             record.type_name == "out_of_order_warning"):
-            out_of_order_ids.append(record.id)
-    if len(out_of_order_ids) > 0:
-        sys.stderr.write(
-            "WARNING: The following {0} records were out of order:\n{1}\n".format(
-            len(out_of_order_ids), out_of_order_ids))
+            self.out_of_order_ids.append(record.id)
+
+    def finish(self):
+        if len(self.out_of_order_ids) > 0:
+            sys.stderr.write(
+                "WARNING: The following {0} records were out of order:\n{1}\n".format(
+                len(self.out_of_order_ids), self.out_of_order_ids))